@@ -13,10 +13,17 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.graph_objs as go
 import base64
-import boto3
-from io import BytesIO
 from openpyxl import load_workbook
 
+from event_log import load_hockey_data_with_pending
+from counts import count_by
+from fact_tables import fact_slice, load_fact_tables, rollup, team_opponents
+from player_stats import STAT_COLUMNS, load_player_stats, player_lines
+from points import load_points, team_points
+from roster_index import with_roster
+from schema import to_boolean
+from s3_client import get_s3_client
+
 
 #st.set_option('deprecation.showPyplotGlobalUse', False)
 # Use the Access Key and Secret Key you just created
@@ -27,8 +34,8 @@ AWS_SECRET_KEY = st.secrets["aws"]["AWS_SECRET_KEY"]
 S3_BUCKET = 'stevensonhockeydata'
 EXCEL_FILE_KEY = 'Stevenson_Hockey.xlsx' 
 
-# Create an S3 client
-s3 = boto3.client('s3', aws_access_key_id=AWS_ACCESS_KEY, aws_secret_access_key=AWS_SECRET_KEY)
+# Shared S3 client for the whole process (pooled, kept alive across reruns)
+s3 = get_s3_client(AWS_ACCESS_KEY, AWS_SECRET_KEY)
 
 
 
@@ -82,22 +89,16 @@ st.sidebar.markdown(
 ###############################################################
 
 
-def read_excel_from_s3(bucket, file_key, sheet_name):
-    # Get the object from S3
-    obj = s3.get_object(Bucket=bucket, Key=file_key)
-    
-    # Read the content of the file into a Pandas DataFrame
-    excel_data = obj['Body'].read()
-    df = pd.read_excel(BytesIO(excel_data), sheet_name=sheet_name)
-    
-    return df
+# Tables are cached for the whole process and only re-read when the table
+# manifest changes (i.e. after compact.py runs). Event batches saved by
+# shots.py since the last compaction are appended on top.
+hockey_data = load_hockey_data_with_pending(s3, S3_BUCKET, EXCEL_FILE_KEY)
 
-# Read the "roster" worksheet from the Excel file
-roster_df = read_excel_from_s3(S3_BUCKET, EXCEL_FILE_KEY, sheet_name="Roster")
-scoring_df = read_excel_from_s3(S3_BUCKET, EXCEL_FILE_KEY, sheet_name="Scoring")
-penalties_df = read_excel_from_s3(S3_BUCKET, EXCEL_FILE_KEY, sheet_name="Penalties")
-shots_df = read_excel_from_s3(S3_BUCKET, EXCEL_FILE_KEY, sheet_name="Shots")
-faceoff_df = read_excel_from_s3(S3_BUCKET, EXCEL_FILE_KEY, sheet_name="Faceoff")
+roster_df = hockey_data.roster
+scoring_df = hockey_data.scoring
+penalties_df = hockey_data.penalties
+shots_df = hockey_data.shots
+faceoff_df = hockey_data.faceoff
 
 
 
@@ -123,95 +124,20 @@ with st.sidebar:
 
 
 
-# final_scoring_df, final_penalties_df, final_shooting_df
-
-scoring_stevenson = scoring_df[scoring_df['ScoringTeam'] == 'Stevenson']
-
-# Perform the merge for 'Stevenson' team
-scoring_merged_stevenson = pd.merge(
-    scoring_stevenson,
-    roster_df[['Team', 'JerseyNumber', 'FirstName', 'LastName', 'Position']],
-    how='left',
-    left_on=['Team', 'Goal'],
-    right_on=['Team', 'JerseyNumber']
-)
-
-# Filter out non-Stevenson scoring records and concatenate them back with the merged Stevenson data
-scoring_non_stevenson = scoring_df[scoring_df['ScoringTeam'] != 'Stevenson']
-
-# Combine the Stevenson merged scoring data with non-Stevenson scoring data
-final_scoring_df = pd.concat([scoring_merged_stevenson, scoring_non_stevenson], ignore_index=True)
-
-
-# Convert the 'GameDate' to a string format (YYYY-MM-DD)
-final_scoring_df['FormattedDate'] = pd.to_datetime(final_scoring_df['GameDate']).dt.strftime('%Y-%m-%d')
-
-# Optionally, if you want to replace the original 'GameDate' column:
-final_scoring_df['GameDate'] = final_scoring_df['FormattedDate']
-final_scoring_df.drop(columns=['FormattedDate'], inplace=True)
-
-
-
-
-
-
-
-penalties_stevenson = penalties_df[penalties_df['PenaltyTeam'] == 'Stevenson']
-
-# Perform the merge for 'Stevenson' team
-penalties_merged_stevenson = pd.merge(
-    penalties_stevenson,
-    roster_df[['Team', 'JerseyNumber', 'FirstName', 'LastName', 'Position']],
-    how='left',
-    left_on=['Team', 'JerseyNumber'],
-    right_on=['Team', 'JerseyNumber']
-)
-
-# Filter out non-Stevenson penalties and concatenate them back with the merged Stevenson data
-penalties_non_stevenson = penalties_df[penalties_df['PenaltyTeam'] != 'Stevenson']
-
-# Combine the Stevenson merged penalties with non-Stevenson penalties
-final_penalties_df = pd.concat([penalties_merged_stevenson, penalties_non_stevenson], ignore_index=True)
-
-# Convert the 'GameDate' to a string format (YYYY-MM-DD)
-final_penalties_df['FormattedDate'] = pd.to_datetime(final_penalties_df['GameDate']).dt.strftime('%Y-%m-%d')
-
-# Optionally, if you want to replace the original 'GameDate' column:
-final_penalties_df['GameDate'] = final_penalties_df['FormattedDate']
-final_penalties_df.drop(columns=['FormattedDate'], inplace=True)
-
-
-
-
+# Roster-enriched scoring, penalties, shots and faceoff tables. They are
+# built once per data version and shared by every rerun and session.
+fact_tables = load_fact_tables(hockey_data)
 
+final_scoring_df = fact_tables.scoring
+final_penalties_df = fact_tables.penalties
+final_shots_df = fact_tables.shots
+final_faceoff_df = fact_tables.faceoff
 
+# Goals, assists and points of every Stevenson player in every game
+points = load_points(fact_tables)
 
-
-
-shots_stevenson = shots_df[shots_df['ShootingTeam'] == 'Stevenson']
-
-# Perform the merge for 'Stevenson' team
-shots_merged_stevenson = pd.merge(
-    shots_stevenson,
-    roster_df[['Team', 'JerseyNumber', 'FirstName', 'LastName', 'Position']],
-    how='left',
-    left_on=['Team', 'JerseyNumber'],
-    right_on=['Team', 'JerseyNumber']
-)
-
-# Filter out non-Stevenson shooting records and concatenate them back with the merged Stevenson data
-shots_non_stevenson = shots_df[shots_df['ShootingTeam'] != 'Stevenson']
-
-# Combine the Stevenson merged shooting data with non-Stevenson shooting data
-final_shots_df = pd.concat([shots_merged_stevenson, shots_non_stevenson], ignore_index=True)
-
-
-# Convert the 'GameDate' to a string format (YYYY-MM-DD)
-final_shots_df['FormattedDate'] = pd.to_datetime(final_shots_df['GameDate']).dt.strftime('%Y-%m-%d')
-
-# Optionally, if you want to replace the original 'GameDate' column:
-final_shots_df['GameDate'] = final_shots_df['FormattedDate']
-final_shots_df.drop(columns=['FormattedDate'], inplace=True)
+# Per-game stat lines and season totals for every Stevenson player
+player_stats = load_player_stats(fact_tables)
 
 
 
@@ -225,31 +151,19 @@ if view_by == "Team":
     
     #st.subheader("Hockey Data Analysis")
     
-    team_outcomes = final_scoring_df[final_scoring_df['Team'] == selected_team]
-    
-    opponents_scoring = final_scoring_df[final_scoring_df['Team'] == selected_team]['Opponent']
-    opponents_shots = final_shots_df[final_shots_df['Team'] == selected_team]['Opponent']
-    opponents_penalties = final_penalties_df[final_penalties_df['Team'] == selected_team]['Opponent']
-    opponents_faceoff = faceoff_df[faceoff_df['Team'] == selected_team]['Opponent']
-
+    # Rows for the selected team, looked up in the prebuilt partitions
+    team_facts = fact_slice(fact_tables, selected_team)
 
-    # Combine all 'Opponent' columns into one DataFrame
-    combined_opponents = pd.concat([opponents_scoring, opponents_shots, opponents_penalties, opponents_faceoff])
+    team_outcomes = team_facts.scoring
 
-    # Drop duplicates to retain only unique values
-    unique_opponents = combined_opponents.drop_duplicates().reset_index(drop=True)
-
-    # Create a new DataFrame from the unique opponents
-    unique_opponents_df = pd.DataFrame(unique_opponents, columns=['Opponent'])
-
-   
-    
-    
     # Add "All" as an option in the dropdown
-    opponent_options = ["All"] + list(unique_opponents_df['Opponent'].unique())
+    opponent_options = ["All"] + team_opponents(fact_tables, selected_team)
 
     # Create the selectbox with "All" as the default value
     selected_opponent = st.sidebar.selectbox("Select Opponent", opponent_options, index=0)
+
+    # Rows for the selected team against the selected opponent ("All" is every opponent)
+    opponent_facts = fact_slice(fact_tables, selected_team, selected_opponent)
     
     
     if selected_opponent != "All":
@@ -275,10 +189,10 @@ if view_by == "Team":
     
     if metric == "Game Outcomes":
  
-        temp_team_outcomes = final_scoring_df[final_scoring_df['Team'] == selected_team]
+        temp_team_outcomes = team_facts.scoring
 
         if selected_opponent != "All":
-                team_outcomes = temp_team_outcomes[temp_team_outcomes['Opponent'] == selected_opponent]
+                team_outcomes = opponent_facts.scoring
         else:
                 team_outcomes = temp_team_outcomes   
     
@@ -288,31 +202,27 @@ if view_by == "Team":
         if team_outcomes.empty:
                 st.subheader(f"No Game Data for {selected_team} against {selected_opponent}")
         else:    
-                # Calculate total unique games played
-                total_games = team_outcomes[['GameDate', 'Team', 'Opponent']].drop_duplicates().shape[0]
-                
+                # One row per game, from the games table
+                games = opponent_facts.games
+                games = games[games['HasResult']]
 
+                won = to_boolean(games['Win']).fillna(False).astype(bool)
+                home = to_boolean(games['Home']).fillna(False).astype(bool)
 
-                
-                #st.dataframe(team_outcomes)
-             
-
-                # Calculate total unique wins
-                total_wins = team_outcomes[team_outcomes['Win'].str.lower() == 'yes'][['GameDate', 'Team', 'Opponent', 'Win']].drop_duplicates().shape[0]
+                # Calculate total games and wins
+                total_games = len(games)
+                total_wins = int(won.sum())
 
                 # Calculate winning rate
                 win_rate = (total_wins / total_games) * 100 if total_games > 0 else 0
 
                 # Calculate home and away games
-                home_games = team_outcomes[team_outcomes['Home'].str.lower() == 'yes']
-                away_games = team_outcomes[team_outcomes['Home'].str.lower() != 'yes']
-
-                total_home_games = home_games[['GameDate', 'Team', 'Opponent']].drop_duplicates().shape[0]
-                total_away_games = away_games[['GameDate', 'Team', 'Opponent']].drop_duplicates().shape[0]
+                total_home_games = int(home.sum())
+                total_away_games = int((~home).sum())
 
                 # Calculate home and away wins
-                home_wins = home_games[home_games['Win'].str.lower() == 'yes'][['GameDate', 'Team', 'Opponent', 'Win']].drop_duplicates().shape[0]
-                away_wins = away_games[away_games['Win'].str.lower() == 'yes'][['GameDate', 'Team', 'Opponent', 'Win']].drop_duplicates().shape[0]
+                home_wins = int((won & home).sum())
+                away_wins = int((won & ~home).sum())
 
                 # Calculate winning rates
                 home_win_rate = (home_wins / total_home_games) * 100 if total_home_games > 0 else 0
@@ -373,7 +283,7 @@ if view_by == "Team":
                 
                 
                 # Prepare data for the scores bar chart
-                scores_data = team_outcomes[['GameDate', 'Opponent', 'ScoreStevenson', 'ScoreOpponent']].drop_duplicates()
+                scores_data = games[['GameDate', 'Opponent', 'ScoreStevenson', 'ScoreOpponent']]
                 scores_data = scores_data.sort_values(by='GameDate')  # Sort by game date for better visual order
                 
                 #st.dataframe(scores_data)
@@ -425,7 +335,7 @@ if view_by == "Team":
                 #st.dataframe(stevenson_scores)
                 
                 # Group by jersey number and name, then count scores
-                score_counts = stevenson_scores.groupby(['JerseyNumber', 'Team','FirstName','LastName','Position']).size().reset_index(name='TotalScores')
+                score_counts = count_by(stevenson_scores, ['JerseyNumber', 'Team','FirstName','LastName','Position'], 'TotalScores')
                 
                 # Merging player counts with roster to include player names
                 #scored_players = pd.merge(score_counts, roster_df, on='JerseyNumber', how='left')
@@ -445,46 +355,22 @@ if view_by == "Team":
                 #st.dataframe(team_outcomes)
 
                 
-                # Selecting the required columns and filtering by 'ScoringTeam'
-                assistants_player1 = team_outcomes[team_outcomes['ScoringTeam'] == 'Stevenson'][['GameDate', 'Team', 'Opponent', 'Assistant_1']]
-
-                # Renaming 'Assistant_1' to 'JerseyNumber'
-                assistants_player1 = assistants_player1.rename(columns={'Assistant_1': 'JerseyNumber'})
-                
-                # Selecting the required columns and filtering by 'ScoringTeam'
-                assistants_player2 = team_outcomes[team_outcomes['ScoringTeam'] == 'Stevenson'][['GameDate', 'Team', 'Opponent', 'Assistant_2']]
-
-                # Renaming 'Assistant_1' to 'JerseyNumber'
-                assistants_player2 = assistants_player2.rename(columns={'Assistant_2': 'JerseyNumber'})                
-                
-                #assistants_player = team_outcomes[team_outcomes['ShootingTeam'] == 'Stevenson'].groupby(['GameDate', 'Team', 'Opponent',]).size().reset_index(name='TotalStevensonShots')
-      
-                assistants_player = pd.concat([assistants_player1, assistants_player2], axis=0)
+                # Assists per player from the points engine (goals melted into
+                # scorer and assister records once per data version)
+                player_points = team_points(points, selected_team, selected_opponent)
+                player_counts = player_points[player_points['Assists'] > 0].rename(columns={'Assists': 'TotalAssistants'})
 
-                # Reset the index after concatenation, if needed
-                assistants_player = assistants_player.reset_index(drop=True)
-                assistants_player = assistants_player.dropna(subset=['JerseyNumber'])
+                # Sorting by TotalAssistants in descending order
+                player_counts = player_counts.sort_values(by='TotalAssistants', ascending=False, kind='stable')
                 
                 
-                # Counting the number of records for each JerseyNumber
-                player_counts = assistants_player.groupby('JerseyNumber').size().reset_index(name='TotalAssistants')
-
-                #player_counts = assistants_player.groupby(['JerseyNumber', 'Team','FirstName','LastName','Position']).size().reset_index(name='TotalAssistants')
-                
-
-                # Sorting by RecordCount in descending order
-                player_counts = player_counts.sort_values(by='TotalAssistants', ascending=False)
-                
-                
-                # Merging player counts with roster to include player names
-                ranked_players = pd.merge(player_counts, roster_df, on='JerseyNumber', how='left')
+                # Looking up player names in the roster index
+                ranked_players = with_roster(player_counts, fact_tables.roster)
 
                 
 
                 st.subheader("Sorted Assistants by Player for Stevenson")
-                #st.dataframe(assistants_player.set_index('JerseyNumber'))
-                #st.dataframe(player_counts.set_index('JerseyNumber'))
-                ranked_players = ranked_players[['JerseyNumber', 'Team', 'FirstName', 'LastName', 'Position', 'TotalAssistants']]
+                ranked_players = ranked_players[['JerseyNumber', 'Team', 'FirstName', 'LastName', 'Position', 'PrimaryAssists', 'SecondaryAssists', 'TotalAssistants', 'Points']]
                 st.dataframe(ranked_players.set_index('JerseyNumber'), width=650)
 
 
@@ -493,19 +379,22 @@ if view_by == "Team":
             
     
     if metric == "Shots":   
-        temp_team_shooting = final_shots_df[final_shots_df['Team'] == selected_team]
+        temp_team_shooting = team_facts.shots
 
 
         if selected_opponent != "All":
-                team_outcomes = temp_team_shooting[temp_team_shooting['Opponent'] == selected_opponent]
-                team_scoring = final_shots_df[(final_shots_df['Team'] == selected_team) & (final_shots_df['Opponent'] == selected_opponent)]
-                team_shooting = final_shots_df[(final_shots_df['Team'] == selected_team) & (final_shots_df['Opponent'] == selected_opponent)]
+                team_outcomes = opponent_facts.shots
+                team_scoring = opponent_facts.shots
+                team_shooting = opponent_facts.shots
 
                 
         else:
                 team_outcomes = temp_team_shooting   
-                team_scoring = final_scoring_df[final_scoring_df['Team'] == selected_team]
-                team_shooting = final_shots_df[final_shots_df['Team'] == selected_team]            
+                team_scoring = team_facts.scoring
+                team_shooting = team_facts.shots            
+
+        # Shot counts for the same rows, from the prebuilt rollup cube
+        shot_counts = opponent_facts.shot_counts
         
         
         
@@ -520,32 +409,15 @@ if view_by == "Team":
                 
                 #st.dataframe(team_shooting)
                 
-                 # Aggregate shooting data by game for Stevenson
-                shooting_summary_team = team_shooting[team_shooting['ShootingTeam'] == 'Stevenson'].groupby(['GameDate', 'Team', 'Opponent']).size().reset_index(name='TotalStevensonShots')
-
-                # Aggregate shooting data by game for Opponents
-                # Assuming 'final_shots_df' should be 'team_shooting', as 'final_shots_df' is not previously defined
-                shooting_summary_opponent = team_shooting[team_shooting['ShootingTeam'] != 'Stevenson'].groupby(['GameDate', 'Opponent']).size().reset_index(name='TotalOpponentShots')
-               
-                       
-                
-                #st.dataframe(shooting_summary_team)
-                #st.dataframe(shooting_summary_opponent)
-                
-                # Merge the scoring and shooting data for Stevenson and Opponent
-                game_summary = pd.merge(
-                    team_scoring[['GameDate', 'Team', 'Opponent']].drop_duplicates(),
-                    shooting_summary_team[['GameDate', 'TotalStevensonShots']],
-                    on='GameDate',
-                    how='left'
-                )
+                # Aggregate shooting data by game for Stevenson and Opponents
+                shooting_summary_team = rollup(shot_counts[shot_counts['ShootingTeam'] == 'Stevenson'], ['GameID'], 'TotalStevensonShots')
+                shooting_summary_opponent = rollup(shot_counts[shot_counts['ShootingTeam'] != 'Stevenson'], ['GameID'], 'TotalOpponentShots')
 
-                game_summary = pd.merge(
-                    game_summary,
-                    shooting_summary_opponent[['GameDate', 'TotalOpponentShots']],
-                    on='GameDate',
-                    how='left'
-                )
+                # Join the shot counts to the games with a result by GameID
+                games = opponent_facts.games
+                game_summary = games[games['HasResult']][['GameID', 'GameDate', 'Team', 'Opponent']]
+                game_summary = pd.merge(game_summary, shooting_summary_team, on='GameID', how='left')
+                game_summary = pd.merge(game_summary, shooting_summary_opponent, on='GameID', how='left')
 
                 # Fill NaN values with 0 for games without shooting data
                 game_summary['TotalShots'] = game_summary['TotalStevensonShots'].fillna(0)
@@ -590,7 +462,8 @@ if view_by == "Team":
 
 
                 # Filter the data for the selected team and opponents
-                team_shooting = final_shots_df[final_shots_df['Team'] == selected_team]
+                team_shooting = team_facts.shots
+                shot_counts = team_facts.shot_counts
                 opponent_shooting = final_shots_df[final_shots_df['Opponent'] == selected_team]
 
                 # Dropdown menu for selecting the view type
@@ -599,11 +472,11 @@ if view_by == "Team":
                 if view_type == "Total":
                     
                     # Aggregate shooting data by game for Stevenson
-                    position_summary_team = team_shooting[team_shooting['ShootingTeam'] == 'Stevenson'].groupby([ 'Team','ShootZone']).size().reset_index(name='TotalStevensonShots')
+                    position_summary_team = rollup(shot_counts[shot_counts['ShootingTeam'] == 'Stevenson'], [ 'Team','ShootZone'], 'TotalStevensonShots')
 
                     # Aggregate shooting data by game for Opponents
                     # Assuming 'final_shots_df' should be 'team_shooting', as 'final_shots_df' is not previously defined
-                    position_summary_opponent = team_shooting[team_shooting['ShootingTeam'] != 'Stevenson'].groupby(['ShootZone']).size().reset_index(name='TotalOpponentShots')
+                    position_summary_opponent = rollup(shot_counts[shot_counts['ShootingTeam'] != 'Stevenson'], ['ShootZone'], 'TotalOpponentShots')
                     
                     #st.dataframe(position_summary_team)
                     #st.dataframe(position_summary_opponent)
@@ -632,11 +505,11 @@ if view_by == "Team":
                     fig.update_layout(barmode='group', title="Total Shots by Shooting Position for Stevenson and Opponent", xaxis_title="Shooting Position", yaxis_title="Total Shots")
 
                 else:
-                    game_position_summary_team = team_shooting[team_shooting['ShootingTeam'] == 'Stevenson'].groupby(['GameDate', 'Team', 'Opponent','ShootZone']).size().reset_index(name='TotalStevensonShots')
+                    game_position_summary_team = rollup(shot_counts[shot_counts['ShootingTeam'] == 'Stevenson'], ['GameDate', 'Team', 'Opponent','ShootZone'], 'TotalStevensonShots')
 
                     # Aggregate shooting data by game for Opponents
                     # Assuming 'final_shots_df' should be 'team_shooting', as 'final_shots_df' is not previously defined
-                    game_position_summary_opponent = team_shooting[team_shooting['ShootingTeam'] != 'Stevenson'].groupby(['GameDate', 'Opponent','ShootZone']).size().reset_index(name='TotalOpponentShots')
+                    game_position_summary_opponent = rollup(shot_counts[shot_counts['ShootingTeam'] != 'Stevenson'], ['GameDate', 'Opponent','ShootZone'], 'TotalOpponentShots')
                     
                     #st.dataframe(game_position_summary_team)
                     #st.dataframe(game_position_summary_opponent)                    
@@ -681,7 +554,7 @@ if view_by == "Team":
                 
                 
                 # Group by jersey number and name, then count scores
-                shots_counts = team_shooting.groupby(['JerseyNumber', 'Team','FirstName','LastName','Position']).size().reset_index(name='TotalShots')
+                shots_counts = rollup(shot_counts, ['JerseyNumber', 'Team','FirstName','LastName','Position'], 'TotalShots')
                 
                 # Merging player counts with roster to include player names
                 #scored_players = pd.merge(score_counts, roster_df, on='JerseyNumber', how='left')
@@ -704,14 +577,17 @@ if view_by == "Team":
     if metric == "Penalties":      
         
         if selected_opponent != "All":
-                team_penalties = final_penalties_df[(final_penalties_df['Team'] == selected_team) & (final_penalties_df['Opponent'] == selected_opponent)]
-                opponent_penalties = final_penalties_df[(final_penalties_df['Team'] == selected_team) & (final_penalties_df['Opponent'] == selected_opponent)]
+                team_penalties = opponent_facts.penalties
+                opponent_penalties = opponent_facts.penalties
 
                 
         else:
-                temp_team_penalties = final_penalties_df[final_penalties_df['Team'] == selected_team]  
-                team_penalties = final_penalties_df[final_penalties_df['Team'] == selected_team]
+                temp_team_penalties = team_facts.penalties  
+                team_penalties = team_facts.penalties
                 opponent_penalties = final_penalties_df[final_penalties_df['Opponent'] == selected_team]          
+
+        # Penalty counts for the same rows, from the prebuilt rollup cube
+        penalty_counts = opponent_facts.penalty_counts
         
       
         
@@ -729,11 +605,11 @@ if view_by == "Team":
                 view_type = st.selectbox("View by", ["Total", "By Game"])
 
                 if view_type == "Total":                         
-                    penalty_summary_team = team_penalties[team_penalties['PenaltyTeam'] == 'Stevenson'].groupby(['PenaltyCode']).size().reset_index(name='TotalStevensonPenalties')
+                    penalty_summary_team = rollup(penalty_counts[penalty_counts['PenaltyTeam'] == 'Stevenson'], ['PenaltyCode'], 'TotalStevensonPenalties')
 
                     # Aggregate shooting data by game for Opponents
                     # Assuming 'final_shots_df' should be 'team_shooting', as 'final_shots_df' is not previously defined
-                    penalty_summary_opponent = team_penalties[team_penalties['PenaltyTeam'] != 'Stevenson'].groupby(['PenaltyCode']).size().reset_index(name='TotalOpponentPenalties')
+                    penalty_summary_opponent = rollup(penalty_counts[penalty_counts['PenaltyTeam'] != 'Stevenson'], ['PenaltyCode'], 'TotalOpponentPenalties')
 
                               
                     #st.dataframe(penalty_summary_team)
@@ -768,9 +644,9 @@ if view_by == "Team":
                     #game_penalty_summary_opponent = opponent_penalties.groupby(['GameDate', 'PenaltyCode']).size().reset_index(name='TotalPenalties')
                     
                     
-                    game_penalty_summary_team = team_penalties[team_penalties['PenaltyTeam'] == 'Stevenson'].groupby(['GameDate', 'Team', 'Opponent','PenaltyCode']).size().reset_index(name='TotalStevensonPenalties')
+                    game_penalty_summary_team = rollup(penalty_counts[penalty_counts['PenaltyTeam'] == 'Stevenson'], ['GameDate', 'Team', 'Opponent','PenaltyCode'], 'TotalStevensonPenalties')
 
-                    game_penalty_summary_opponent = team_penalties[team_penalties['PenaltyTeam'] != 'Stevenson'].groupby(['GameDate', 'Opponent','PenaltyCode']).size().reset_index(name='TotalOpponentPenalties')
+                    game_penalty_summary_opponent = rollup(penalty_counts[penalty_counts['PenaltyTeam'] != 'Stevenson'], ['GameDate', 'Opponent','PenaltyCode'], 'TotalOpponentPenalties')
                     
                     
                     
@@ -815,7 +691,7 @@ if view_by == "Team":
                 
                 
                 # Group by jersey number and name, then count scores
-                penalties_counts = team_penalties.groupby(['JerseyNumber', 'Team','FirstName','LastName','Position']).size().reset_index(name='TotalNumPenalties')
+                penalties_counts = rollup(penalty_counts, ['JerseyNumber', 'Team','FirstName','LastName','Position'], 'TotalNumPenalties')
                 
                 # Merging player counts with roster to include player names
                 #scored_players = pd.merge(score_counts, roster_df, on='JerseyNumber', how='left')
@@ -837,10 +713,10 @@ if view_by == "Team":
         #faceoff_outcomes = final_faceoff_df[final_faceoff_df['Team'] == selected_team]    
         
         if selected_opponent != "All":
-                faceoff_stevenson = faceoff_df[(faceoff_df['Team'] == selected_team) & (faceoff_df['Opponent'] == selected_opponent)]
+                faceoff_stevenson = opponent_facts.faceoff
                 
         else:
-                faceoff_stevenson = faceoff_df[faceoff_df['Team'] == selected_team]
+                faceoff_stevenson = team_facts.faceoff
         
 
         
@@ -853,21 +729,15 @@ if view_by == "Team":
             
             
             
-                # Perform the merge for 'Stevenson' team
-                faceoff_merged_stevenson = pd.merge(
-                    faceoff_stevenson,
-                    roster_df[['Team', 'JerseyNumber', 'FirstName', 'LastName', 'Position']],
-                    how='left',
-                    left_on=['Team', 'JerseyNumber'],
-                    right_on=['Team', 'JerseyNumber']
-                )                  
+                # Already joined with the roster in final_faceoff_df
+                faceoff_merged_stevenson = faceoff_stevenson
 
                 
                 
                 #st.dataframe(faceoff_merged_stevenson.set_index('JerseyNumber'), width=650)
 
                 
-                summary = faceoff_merged_stevenson.groupby(['JerseyNumber', 'FirstName', 'LastName', 'Position']).agg(
+                summary = faceoff_merged_stevenson.groupby(['JerseyNumber', 'FirstName', 'LastName', 'Position'], observed=True).agg(
                     total_wins=('Win', 'sum'),
                     total_losses=('Lose', 'sum')
                 ).reset_index()
@@ -909,106 +779,15 @@ elif view_by == "Player":
     #st.write(jersey_number)  
     
     
-    player_shots = final_shots_df[(final_shots_df['LastName'] + ", " + final_shots_df['FirstName']) == selected_player]
-    player_scores = final_scoring_df[(final_scoring_df['LastName'] + ", " + final_scoring_df['FirstName']) == selected_player]
-    player_penalties = final_penalties_df[(final_penalties_df['LastName'] + ", " + final_penalties_df['FirstName']) == selected_player]    
-
-         
-    #st.dataframe(player_shots.set_index('JerseyNumber'), width=650)
-    #st.dataframe(player_scores.set_index('JerseyNumber'), width=650)
-    #st.dataframe(player_penalties.set_index('JerseyNumber'), width=650)
+    # Per-game stat lines of every player are built once per data version;
+    # the selected player's are a lookup by (Team, JerseyNumber)
+    result = player_lines(player_stats, selected_team, jersey_number)
 
     
-    if player_shots.empty & player_scores.empty & player_penalties.empty:
+    if result.empty:
             st.subheader(f"No Data for {selected_player}")
     else:
             st.subheader(f"Statistics for {selected_player}")
-            
-            #st.dataframe(player_shots, width=650)
-            shots_counts_player = player_shots.groupby(['GameDate','Opponent','JerseyNumber']).size().reset_index(name='TotalShots')
-            
-            
-            # Sort the scores in descending order
-            shots_counts_player = shots_counts_player.sort_values(by='GameDate', ascending=False)
-
-
-  
-    
-    
-            score_counts_player = player_scores.groupby(['GameDate','Opponent','JerseyNumber']).size().reset_index(name='TotalScores')
-            
-            
-            # Sort the scores in descending order
-            score_counts_player = score_counts_player.sort_values(by='GameDate', ascending=False)
-
-            
-           
-            
-            
-            team_outcomes = final_scoring_df[final_scoring_df['Team'] == selected_team]
-            
-            # Selecting the required columns and filtering by 'ScoringTeam'
-            #assistants_player1 = team_outcomes[team_outcomes['ScoringTeam'] == 'Stevenson'][['GameDate', 'Team', 'Opponent', 'Assistant_1']]
-            
-            assistants_player1 = team_outcomes[
-    (team_outcomes['ScoringTeam'] == 'Stevenson') &
-    (team_outcomes['Assistant_1'] == jersey_number)
-][['GameDate', 'Team', 'Opponent', 'Assistant_1']]
-
-            # Renaming 'Assistant_1' to 'JerseyNumber'
-            assistants_player1 = assistants_player1.rename(columns={'Assistant_1': 'JerseyNumber'})
-                
-            # Selecting the required columns and filtering by 'ScoringTeam'
-            #assistants_player2 = team_outcomes[team_outcomes['ScoringTeam'] == 'Stevenson'][['GameDate', 'Team', 'Opponent', 'Assistant_2']]
-            
-            assistants_player2 = team_outcomes[
-    (team_outcomes['ScoringTeam'] == 'Stevenson') &
-    (team_outcomes['Assistant_1'] == jersey_number)
-][['GameDate', 'Team', 'Opponent', 'Assistant_2']]
-
-            # Renaming 'Assistant_1' to 'JerseyNumber'
-            assistants_player2 = assistants_player2.rename(columns={'Assistant_2': 'JerseyNumber'})                
-                
-      
-            assistants_player = pd.concat([assistants_player1, assistants_player2], axis=0)
-
-            # Reset the index after concatenation, if needed
-            assistants_player = assistants_player.reset_index(drop=True)
-            assistants_player = assistants_player.dropna(subset=['JerseyNumber'])
-                
-            
-            #st.dataframe(assistants_player.set_index('JerseyNumber'), width=600)
-            #st.write(assistants_player.columns)
-            
-            # Counting the number of records for each JerseyNumber
-            player_assistants_counts = assistants_player.groupby(['JerseyNumber', 'GameDate','Opponent']).size().reset_index(name='TotalAssistants')
-
-            
-            #st.dataframe(player_assistants_counts.set_index('JerseyNumber'), width=600)
-            
-    
-    
-    
-    
-    
-            penaltys_counts_player = player_penalties.groupby(['GameDate','Opponent','JerseyNumber']).size().reset_index(name='TotalPenalties')
-            
-            
-            # Sort the scores in descending order
-            penaltys_counts_player = penaltys_counts_player.sort_values(by='GameDate', ascending=False)
-
-    
-    
-            # Merge the DataFrames on 'JerseyNumber', 'GameDate', and 'Opponent', keeping all records
-            result = score_counts_player.merge(shots_counts_player, on=['JerseyNumber', 'GameDate', 'Opponent'], how='outer')
-            result = result.merge(penaltys_counts_player, on=['JerseyNumber', 'GameDate', 'Opponent'], how='outer')
-            result = result.merge(player_assistants_counts, on=['JerseyNumber', 'GameDate', 'Opponent'], how='outer')
-
-            # Replace null values with 0
-            result.fillna(0, inplace=True)
-
-    
-            result = result.sort_values(by='GameDate', ascending=False)
         
         
             total_scores = result['TotalScores'].sum()
@@ -1031,7 +810,7 @@ elif view_by == "Player":
             st.markdown("<hr>", unsafe_allow_html=True)
             
         
-            st.dataframe(result.set_index('JerseyNumber'), width=900)
+            st.dataframe(result[['JerseyNumber', 'GameDate', 'Opponent'] + STAT_COLUMNS + ['ShootingPct']].set_index('JerseyNumber'), width=900)
       
         
     st.markdown("<hr>", unsafe_allow_html=True)
@@ -1076,7 +855,7 @@ elif view_by == "Game":
 
             elif metric == "Game Outcomes":
                 game_outcomes = final_scoring_df[final_scoring_df['GameDate'] == selected_game]
-                outcomes = game_outcomes.groupby('Team')['Win'].first()  # Assuming 'Win' is a binary column
+                outcomes = game_outcomes.groupby('Team', observed=True)['Win'].first()  # Assuming 'Win' is a binary column
                 st.subheader(f"Game Outcomes for {selected_game}")
                 st.line_chart(outcomes)
 
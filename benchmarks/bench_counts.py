@@ -0,0 +1,84 @@
+import os, sys
+import timeit
+from io import BytesIO
+
+import pandas as pd
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+
+from bench_schema import WORKBOOK, multi_season
+from counts import count_by
+from schema import apply_schema
+
+
+# The dashboards' count tables with pandas groupby and with the bincount
+# kernel in counts.py, on the typed tables of the workbook's games repeated
+# over several seasons and teams (see bench_schema.py).
+#
+#   python benchmarks/bench_counts.py [path/to/Stevenson_Hockey.xlsx] [seasons]
+
+SEASONS = 10
+
+SHOT_CUBE = ['Team', 'Opponent', 'GameDate', 'Period', 'ShootingTeam', 'ShootZone', 'JerseyNumber']
+
+
+def best_of(statement, number=10):
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number * 1000
+
+
+def cases(tables):
+    shots, scoring, penalties = tables["Shots"], tables["Scoring"], tables["Penalties"]
+    cube = shots.groupby(SHOT_CUBE, dropna=False, observed=True).size().reset_index(name='Count')
+    stevenson_goals = scoring[scoring['ScoringTeam'] == 'Stevenson']
+
+    # name: (rows, pandas groupby, kernel)
+    return {
+        "shot cube": (
+            shots,
+            lambda: shots.groupby(SHOT_CUBE, dropna=False, observed=True).size().reset_index(name='Count'),
+            lambda: count_by(shots, SHOT_CUBE, 'Count', dropna=False),
+        ),
+        "shots per zone (cube)": (
+            cube,
+            lambda: cube.groupby(['GameDate', 'ShootZone'], observed=True)['Count'].sum().reset_index(name='TotalShots'),
+            lambda: count_by(cube, ['GameDate', 'ShootZone'], 'TotalShots', weights='Count'),
+        ),
+        "shots per zone (rows)": (
+            shots,
+            lambda: shots.groupby(['Team', 'ShootZone'], observed=True).size().reset_index(name='TotalShots'),
+            lambda: count_by(shots, ['Team', 'ShootZone'], 'TotalShots'),
+        ),
+        "goals per player": (
+            stevenson_goals,
+            lambda: stevenson_goals.groupby(['Team', 'Goal'], observed=True).size().reset_index(name='TotalScores'),
+            lambda: count_by(stevenson_goals, ['Team', 'Goal'], 'TotalScores'),
+        ),
+        "penalties per code": (
+            penalties,
+            lambda: penalties.groupby(['Team', 'Opponent', 'PenaltyCode'], observed=True).size().reset_index(name='TotalPenalties'),
+            lambda: count_by(penalties, ['Team', 'Opponent', 'PenaltyCode'], 'TotalPenalties'),
+        ),
+    }
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else WORKBOOK
+    seasons = int(sys.argv[2]) if len(sys.argv) > 2 else SEASONS
+
+    with open(path, 'rb') as f, pd.ExcelFile(BytesIO(f.read())) as workbook:
+        tables = {
+            sheet_name: apply_schema(sheet_name, multi_season(workbook.parse(sheet_name), seasons))
+            for sheet_name in ("Shots", "Scoring", "Penalties")
+        }
+
+    print(f"{'count':<24} {'rows':>8} {'groupby ms':>11} {'bincount ms':>12} {'speedup':>8}")
+    for name, (rows, with_groupby, with_kernel) in cases(tables).items():
+        pd.testing.assert_frame_equal(with_groupby(), with_kernel(), check_dtype=False, check_categorical=False)
+
+        groupby_ms = best_of(with_groupby)
+        kernel_ms = best_of(with_kernel)
+        print(f"{name:<24} {len(rows):>8} {groupby_ms:>11.2f} {kernel_ms:>12.2f} {groupby_ms / kernel_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import os, sys
+import timeit
+
+import pandas as pd
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+
+from hockey_data import parse_workbook
+from roster_index import build_roster_index, with_roster
+
+
+# Compares adding roster names to the Shots table with pd.merge (as the
+# dashboards did) against the roster index, on the workbook's data copied
+# to 1x, 10x and 100x as many teams and shots.
+#
+#   python benchmarks/bench_roster_index.py [path/to/Stevenson_Hockey.xlsx]
+
+WORKBOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Stevenson_Hockey.xlsx')
+ROSTER_COLUMNS = ['Team', 'JerseyNumber', 'FirstName', 'LastName', 'Position']
+SCALES = [1, 10, 100]
+
+
+# Copies of the roster and shots, copy i playing as "<Team> i"
+def scaled(roster, shots, scale):
+    rosters, shot_tables = [], []
+    for i in range(scale):
+        rosters.append(roster.assign(Team=roster['Team'].astype(str) + f" {i}"))
+        shot_tables.append(shots.assign(Team=shots['Team'].astype(str) + f" {i}"))
+    return pd.concat(rosters, ignore_index=True), pd.concat(shot_tables, ignore_index=True)
+
+
+def with_merge(shots, roster):
+    return pd.merge(shots, roster[ROSTER_COLUMNS], how='left', on=['Team', 'JerseyNumber'])
+
+
+def best_of(statement, number):
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number * 1000
+
+
+def main():
+    with open(sys.argv[1] if len(sys.argv) > 1 else WORKBOOK, 'rb') as f:
+        data = parse_workbook(f.read())
+
+    shots = data.shots[data.shots['ShootingTeam'] == 'Stevenson']
+
+    print(f"{'scale':>5} {'roster':>7} {'shots':>8} {'merge ms':>9} {'index ms':>9} {'build ms':>9} {'speedup':>8}")
+    for scale in SCALES:
+        roster, events = scaled(data.roster, shots, scale)
+        index = build_roster_index(roster)
+
+        merged = with_merge(events, roster)
+        looked_up = with_roster(events, index)
+        for column in ['FirstName', 'LastName', 'Position']:
+            pd.testing.assert_series_equal(merged[column], looked_up[column], check_dtype=False, check_index=False)
+
+        number = max(1, 200 // scale)
+        merge_ms = best_of(lambda: with_merge(events, roster), number)
+        index_ms = best_of(lambda: with_roster(events, index), number)
+        build_ms = best_of(lambda: build_roster_index(roster), number)
+
+        print(f"{scale:>5} {len(roster):>7} {len(events):>8} {merge_ms:>9.2f} {index_ms:>9.2f} {build_ms:>9.2f} {merge_ms / index_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
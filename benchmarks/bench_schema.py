@@ -0,0 +1,83 @@
+import os, sys
+import timeit
+from io import BytesIO
+
+import pandas as pd
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+
+from hockey_data import SHEET_NAMES
+from schema import apply_schema
+
+
+# Memory use and groupby time of the Shots, Scoring and Penalties tables
+# as they used to be loaded (strings, floats for blank jerseys, 'Yes'/'No',
+# 'YYYY-MM-DD' dates) and typed with schema.py, on the workbook's games
+# repeated over several seasons and teams.
+#
+#   python benchmarks/bench_schema.py [path/to/Stevenson_Hockey.xlsx] [seasons]
+
+WORKBOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Stevenson_Hockey.xlsx')
+SEASONS = 10
+GAMES_PER_SEASON = 25  # copies of the workbook's games per team and season
+TEAMS = ["Varsity Gold", "Varsity Green", "JV White", "JV Gold"]
+
+GROUPBYS = {
+    "Shots": ['Team', 'Opponent', 'GameDate', 'ShootingTeam', 'ShootZone'],
+    "Scoring": ['Team', 'Opponent', 'GameDate', 'ScoringTeam', 'Win'],
+    "Penalties": ['Team', 'Opponent', 'GameDate', 'PenaltyTeam', 'PenaltyCode'],
+}
+
+
+# The sheet repeated for every team, season and game copy, with its own
+# dates and opponents
+def multi_season(df, seasons):
+    copies = []
+    for season in range(seasons):
+        for team in TEAMS:
+            for game in range(GAMES_PER_SEASON):
+                copies.append(df.assign(
+                    Team=team,
+                    Opponent=df['Opponent'] + f" {game % 12}",
+                    GameDate=pd.to_datetime(df['GameDate']) + pd.DateOffset(years=season, days=game),
+                ))
+    return pd.concat(copies, ignore_index=True)
+
+
+# The sheet as the dashboards held it before: everything from the workbook
+# as read, with GameDate formatted as a string
+def untyped(df):
+    return df.assign(GameDate=pd.to_datetime(df['GameDate']).dt.strftime('%Y-%m-%d'))
+
+
+def best_of(statement, number=5):
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number * 1000
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else WORKBOOK
+    seasons = int(sys.argv[2]) if len(sys.argv) > 2 else SEASONS
+
+    with open(path, 'rb') as f, pd.ExcelFile(BytesIO(f.read())) as workbook:
+        sheets = {sheet_name: workbook.parse(sheet_name) for sheet_name in SHEET_NAMES if sheet_name in workbook.sheet_names}
+
+    print(f"{'table':<10} {'rows':>8} {'before MB':>10} {'typed MB':>9} {'saved':>6} {'groupby ms':>11} {'typed ms':>9} {'speedup':>8}")
+    for sheet_name, by in GROUPBYS.items():
+        big = multi_season(sheets[sheet_name], seasons)
+        before = untyped(big)
+        typed = apply_schema(sheet_name, big)
+
+        before_mb = before.memory_usage(deep=True).sum() / 2 ** 20
+        typed_mb = typed.memory_usage(deep=True).sum() / 2 ** 20
+
+        before_ms = best_of(lambda: before.groupby(by).size())
+        typed_ms = best_of(lambda: typed.groupby(by, observed=True).size())
+
+        print(
+            f"{sheet_name:<10} {len(big):>8} {before_mb:>10.1f} {typed_mb:>9.1f} {1 - typed_mb / before_mb:>6.0%}"
+            f" {before_ms:>11.1f} {typed_ms:>9.1f} {before_ms / typed_ms:>7.1f}x"
+        )
+
+
+if __name__ == '__main__':
+    main()
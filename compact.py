@@ -0,0 +1,29 @@
+import sys
+
+sys.path.insert(1, './shared')
+
+import streamlit as st
+
+from event_log import compact_event_log, expire_batch_index
+from s3_client import get_s3_client, s3_client_stats
+
+# Fold the event batches saved by shots.py into their tables (see
+# migrate_workbook.py), and delete the old entries of the events/keys/
+# index. Run periodically, e.g. after each game night:
+#   python compact.py
+
+AWS_ACCESS_KEY = st.secrets["aws"]["AWS_ACCESS_KEY"]
+AWS_SECRET_KEY = st.secrets["aws"]["AWS_SECRET_KEY"]
+
+S3_BUCKET = 'stevensonhockeydata'
+
+# Shared S3 client for the whole process (pooled, kept alive across reruns)
+s3 = get_s3_client(AWS_ACCESS_KEY, AWS_SECRET_KEY)
+
+
+if __name__ == "__main__":
+    compacted = compact_event_log(s3, S3_BUCKET)
+    print(f"Compacted {compacted} event batches")
+    expired = expire_batch_index(s3, S3_BUCKET)
+    print(f"Expired {expired} batch index entries")
+    print(f"S3 requests: {s3_client_stats()}")
@@ -0,0 +1,100 @@
+import argparse
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(1, './shared')
+
+import streamlit as st
+
+from aggregates import AGGREGATES_KEY
+from hockey_data import MAX_WRITE_ATTEMPTS, SHEET_NAMES, WriteConflictError, backoff, load_hockey_data
+from s3_client import get_s3_client
+from table_store import read_manifest, write_manifest, write_table
+
+# One-time migration from Stevenson_Hockey.xlsx to one storage object per
+# table plus tables/manifest.json:
+#   python migrate_workbook.py
+# Saves go to the tables from then on and never to the workbook, so a table
+# of games can only be migrated once: importing it again would replace it
+# with the workbook's stale rows. The Roster, which is still edited in
+# Excel, can be re-imported:
+#   python migrate_workbook.py --sheets Roster
+
+AWS_ACCESS_KEY = st.secrets["aws"]["AWS_ACCESS_KEY"]
+AWS_SECRET_KEY = st.secrets["aws"]["AWS_SECRET_KEY"]
+
+S3_BUCKET = 'stevensonhockeydata'
+EXCEL_FILE_KEY = 'Stevenson_Hockey.xlsx'
+
+REIMPORTABLE_SHEETS = ['Roster']
+
+# Shared S3 client for the whole process (pooled, kept alive across reruns)
+s3 = get_s3_client(AWS_ACCESS_KEY, AWS_SECRET_KEY)
+
+
+# Sheets of sheet_names that manifest already holds and that only saves add to
+def _migrated_game_tables(manifest, sheet_names):
+    tables = manifest['tables'] if manifest else {}
+    return [sheet_name for sheet_name in sheet_names if sheet_name in tables and sheet_name not in REIMPORTABLE_SHEETS]
+
+
+def migrate_workbook(s3, bucket, file_key, sheet_names):
+    migrated = _migrated_game_tables(read_manifest(s3, bucket)[0], sheet_names)
+    if migrated:
+        raise RuntimeError(
+            f"{', '.join(migrated)} already migrated; the rows saved since are only in the tables. "
+            f"Only {', '.join(REIMPORTABLE_SHEETS)} can be re-imported."
+        )
+
+    data = load_hockey_data(s3, bucket, file_key)
+
+    # Write every table first; they only become visible with the manifest
+    migrated_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    entries = {}
+    for sheet_name, df in zip(SHEET_NAMES, data):
+        if sheet_name not in sheet_names:
+            continue
+
+        entries[sheet_name] = {
+            'key': write_table(s3, bucket, sheet_name, df),
+            # Event batches already folded into this sheet of the workbook
+            'compacted_batches': {k: migrated_at for k in sorted(data.compacted_batches) if k.split('/')[-2] == sheet_name},
+        }
+
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        manifest, manifest_etag = read_manifest(s3, bucket)
+        migrated = _migrated_game_tables(manifest, entries)
+        if migrated:
+            # Migrated by someone else meanwhile
+            for entry in entries.values():
+                s3.delete_object(Bucket=bucket, Key=entry['key'])
+            raise RuntimeError(f"{', '.join(migrated)} migrated meanwhile")
+        previous = dict(manifest['tables']) if manifest else {}
+
+        manifest = {'tables': {**previous, **entries}}
+        if write_manifest(s3, bucket, manifest, manifest_etag):
+            break
+        backoff(attempt)
+    else:
+        raise WriteConflictError("Could not update the table manifest")
+
+    # Remove the table versions that were replaced
+    for sheet_name in entries:
+        if sheet_name in previous:
+            s3.delete_object(Bucket=bucket, Key=previous[sheet_name]['key'])
+
+    # The dashboard totals no longer match the migrated rows; stats.py
+    # rebuilds them on its next load
+    if set(entries) - set(REIMPORTABLE_SHEETS):
+        s3.delete_object(Bucket=bucket, Key=AGGREGATES_KEY)
+
+    return entries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy workbook sheets into per-table storage objects")
+    parser.add_argument("--sheets", nargs="+", choices=SHEET_NAMES, default=SHEET_NAMES)
+    args = parser.parse_args()
+
+    for sheet_name, entry in migrate_workbook(s3, S3_BUCKET, EXCEL_FILE_KEY, args.sheets).items():
+        print(f"{sheet_name}: {entry['key']}")
@@ -0,0 +1,100 @@
+import argparse
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(1, './shared')
+
+import streamlit as st
+
+from aggregates import (
+    GAME_COLUMNS,
+    GAME_KEY,
+    PLAYER_KEY,
+    PLAYER_TOTALS,
+    read_aggregates,
+    rebuild_store,
+    write_aggregates,
+)
+from event_log import load_hockey_data_with_pending
+from hockey_data import MAX_WRITE_ATTEMPTS, WriteConflictError, backoff
+from s3_client import get_s3_client
+from table_store import COMPACTED_RETENTION
+
+# Rebuild the dashboard totals in aggregates/aggregates.json from every row
+# of the tables and pending event batches:
+#   python rebuild_aggregates.py
+# Check that the totals kept up to date by shots.py match a full rebuild,
+# without writing anything:
+#   python rebuild_aggregates.py --verify
+
+AWS_ACCESS_KEY = st.secrets["aws"]["AWS_ACCESS_KEY"]
+AWS_SECRET_KEY = st.secrets["aws"]["AWS_SECRET_KEY"]
+
+S3_BUCKET = 'stevensonhockeydata'
+EXCEL_FILE_KEY = 'Stevenson_Hockey.xlsx'
+
+# Shared S3 client for the whole process (pooled, kept alive across reruns)
+s3 = get_s3_client(AWS_ACCESS_KEY, AWS_SECRET_KEY)
+
+
+# Differences between two stores, as printable lines
+def compare_stores(stored, rebuilt):
+    differences = []
+
+    for batch_key in sorted(rebuilt['applied_batches'].keys() - stored['applied_batches'].keys()):
+        differences.append(f"batch not applied: {batch_key}")
+
+    # The manifest forgets compacted batches before the store forgets applied ones
+    recent = (datetime.now(timezone.utc) - COMPACTED_RETENTION).isoformat(timespec='seconds')
+    for batch_key in sorted(stored['applied_batches'].keys() - rebuilt['applied_batches'].keys()):
+        if stored['applied_batches'][batch_key] >= recent:
+            differences.append(f"batch applied but not in the data: {batch_key}")
+
+    for name, key_columns, value_columns in (('games', GAME_KEY, GAME_COLUMNS), ('players', PLAYER_KEY, PLAYER_TOTALS)):
+        for key in sorted(set(stored[name]) | set(rebuilt[name]), key=str):
+            stored_values = stored[name].get(key, {})
+            rebuilt_values = rebuilt[name].get(key, {})
+            for column in value_columns:
+                if stored_values.get(column) != rebuilt_values.get(column):
+                    differences.append(
+                        f"{name} {dict(zip(key_columns, key))} {column}: "
+                        f"stored {stored_values.get(column)}, rebuilt {rebuilt_values.get(column)}"
+                    )
+
+    return differences
+
+
+def verify_aggregates(s3, bucket, file_key):
+    stored, _ = read_aggregates(s3, bucket)
+    if stored is None:
+        return ["aggregates/aggregates.json does not exist"]
+
+    rebuilt = rebuild_store(load_hockey_data_with_pending(s3, bucket, file_key))
+    return compare_stores(stored, rebuilt)
+
+
+def rebuild_aggregates(s3, bucket, file_key):
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        _, etag = read_aggregates(s3, bucket)
+        store = rebuild_store(load_hockey_data_with_pending(s3, bucket, file_key))
+        if write_aggregates(s3, bucket, store, etag):
+            return store
+        backoff(attempt)
+
+    raise WriteConflictError("Could not update the aggregates")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or verify the dashboard totals")
+    parser.add_argument("--verify", action="store_true", help="compare the stored totals with a full rebuild")
+    args = parser.parse_args()
+
+    if args.verify:
+        differences = verify_aggregates(s3, S3_BUCKET, EXCEL_FILE_KEY)
+        for difference in differences:
+            print(difference)
+        print("Aggregates match a full rebuild" if not differences else f"{len(differences)} differences")
+        sys.exit(1 if differences else 0)
+
+    store = rebuild_aggregates(s3, S3_BUCKET, EXCEL_FILE_KEY)
+    print(f"Rebuilt totals for {len(store['games'])} games and {len(store['players'])} player/opponent pairs")
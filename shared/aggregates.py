@@ -0,0 +1,270 @@
+import json
+import threading
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+import pandas as pd
+from botocore.exceptions import ClientError
+
+from hockey_data import (
+    MAX_WRITE_ATTEMPTS,
+    SHEET_NAMES,
+    backoff,
+    conditional_put,
+    is_missing_error,
+    is_not_modified_error,
+)
+from schema import apply_schema
+from table_store import COMPACTED_RETENTION
+
+
+# Running totals for the dashboards, kept in aggregates/aggregates.json next
+# to the tables and event batches. shots.py adds the rows of every batch it
+# saves (update_aggregates), so stats.py reads the totals instead of
+# recounting every row. The store lists the batches it has applied; when it
+# is missing or behind the data (e.g. a save crashed before updating it, or
+# migrate_workbook.py migrated the tables and deleted it) load_aggregates
+# rebuilds it from the full tables. rebuild_aggregates.py --verify checks
+# that the incremental totals match a full rebuild.
+AGGREGATES_KEY = 'aggregates/aggregates.json'
+
+# The store maps applied batches to when they were applied. A batch is
+# applied when it is saved, before it is compacted, so its key is kept for
+# twice as long as the manifest keeps compacted keys: the data's batches
+# are then still listed as applied, and a late retry of a save is still
+# skipped, without the list growing forever.
+APPLIED_RETENTION = 2 * COMPACTED_RETENTION
+
+GAME_KEY = ['GameDate', 'Team', 'Opponent']
+GAME_COLUMNS = ['Home', 'Win', 'ScoreStevenson', 'ScoreOpponent']
+
+PLAYER_KEY = ['Team', 'Opponent', 'JerseyNumber']
+PLAYER_TOTALS = ['Goals', 'Assists', 'Shots', 'Penalties', 'PenaltyMins', 'FaceoffWins', 'FaceoffLosses', 'FaceoffEntries']
+
+
+class Aggregates(NamedTuple):
+    games: pd.DataFrame  # one row per game with a result: GAME_KEY + GAME_COLUMNS
+    players: pd.DataFrame  # PLAYER_KEY + PLAYER_TOTALS for Stevenson players
+    version: str = ""
+
+
+def _empty_store():
+    return {'applied_batches': {}, 'games': {}, 'players': {}}
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def _game_dates(series):
+    return pd.to_datetime(series).dt.strftime('%Y-%m-%d')
+
+
+def _jerseys(series):
+    return pd.to_numeric(series, errors='coerce')
+
+
+def _add_counts(store, df, jersey_column, total, values=None):
+    df = df.assign(JerseyNumber=_jerseys(df[jersey_column]))
+    df = df.dropna(subset=PLAYER_KEY)
+    if df.empty:
+        return
+
+    if values is None:
+        sums = df.groupby(PLAYER_KEY, sort=False, observed=True).size()
+    else:
+        sums = pd.to_numeric(df[values], errors='coerce').fillna(0).groupby([df[key] for key in PLAYER_KEY], sort=False, observed=True).sum()
+
+    for (team, opponent, jersey), value in sums.items():
+        totals = store['players'].setdefault((team, opponent, int(jersey)), dict.fromkeys(PLAYER_TOTALS, 0))
+        totals[total] += value.item() if hasattr(value, 'item') else value
+
+
+# Add the rows of one sheet to the totals. Applying every batch on its own
+# gives the same totals as applying the whole table at once.
+def apply_rows(store, sheet_name, df):
+    if df.empty or any(key not in df.columns for key in GAME_KEY):
+        return
+
+    # Rows saved by shots.py arrive untyped ('Yes'/'No', string jerseys)
+    df = apply_schema(sheet_name, df)
+    df = df.assign(GameDate=_game_dates(df['GameDate']))
+
+    if sheet_name == 'Scoring':
+        # Results are repeated on every goal row; the last one saved counts, as in fact_tables
+        for row in df.dropna(subset=GAME_KEY).drop_duplicates(GAME_KEY, keep='last').itertuples(index=False):
+            key = tuple(getattr(row, column) for column in GAME_KEY)
+            store['games'][key] = {column: _json_value(getattr(row, column, None)) for column in GAME_COLUMNS}
+
+        stevenson = df[df['ScoringTeam'] == 'Stevenson']
+        _add_counts(store, stevenson, 'Goal', 'Goals')
+        for column in ('Assistant_1', 'Assistant_2'):
+            if column in stevenson.columns:
+                _add_counts(store, stevenson, column, 'Assists')
+
+    elif sheet_name == 'Shots':
+        _add_counts(store, df[df['ShootingTeam'] == 'Stevenson'], 'JerseyNumber', 'Shots')
+
+    elif sheet_name == 'Penalties':
+        stevenson = df[df['PenaltyTeam'] == 'Stevenson']
+        _add_counts(store, stevenson, 'JerseyNumber', 'Penalties')
+        _add_counts(store, stevenson, 'JerseyNumber', 'PenaltyMins', 'PenaltyMins')
+
+    elif sheet_name == 'Faceoff':
+        _add_counts(store, df, 'JerseyNumber', 'FaceoffEntries')
+        _add_counts(store, df, 'JerseyNumber', 'FaceoffWins', 'Win')
+        _add_counts(store, df, 'JerseyNumber', 'FaceoffLosses', 'Lose')
+
+
+def _json_value(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+# Totals recomputed from every row of data (a HockeyData bundle that
+# includes the pending batches)
+def rebuild_store(data):
+    store = _empty_store()
+    for sheet_name, df in zip(SHEET_NAMES, data):
+        apply_rows(store, sheet_name, df)
+    store['applied_batches'] = dict.fromkeys(sorted(data.compacted_batches), _now())
+    return store
+
+
+def _encode(store):
+    return json.dumps({
+        'applied_batches': dict(sorted(store['applied_batches'].items())),
+        'games': [dict(zip(GAME_KEY, key), **values) for key, values in store['games'].items()],
+        'players': [dict(zip(PLAYER_KEY, key), **totals) for key, totals in store['players'].items()],
+    }).encode()
+
+
+def _decode(body):
+    raw = json.loads(body)
+    applied = raw['applied_batches']
+    return {
+        # Stores written before the apply times were kept list the keys only
+        'applied_batches': dict.fromkeys(applied, _now()) if isinstance(applied, list) else applied,
+        'games': {tuple(game[column] for column in GAME_KEY): {column: game[column] for column in GAME_COLUMNS} for game in raw['games']},
+        'players': {tuple(player[column] for column in PLAYER_KEY): {column: player[column] for column in PLAYER_TOTALS} for player in raw['players']},
+    }
+
+
+# Fetch the store. Returns (None, None) when it does not exist yet, and
+# raises the 304 ClientError when if_none_match matches.
+def read_aggregates(s3, bucket, if_none_match=None):
+    try:
+        if if_none_match is None:
+            obj = s3.get_object(Bucket=bucket, Key=AGGREGATES_KEY)
+        else:
+            obj = s3.get_object(Bucket=bucket, Key=AGGREGATES_KEY, IfNoneMatch=if_none_match)
+    except ClientError as e:
+        if is_missing_error(e):
+            return None, None
+        raise
+    return _decode(obj['Body'].read()), obj['ETag']
+
+
+def write_aggregates(s3, bucket, store, expected_etag):
+    return conditional_put(s3, bucket, AGGREGATES_KEY, _encode(store), expected_etag)
+
+
+# Add newly saved event batches ({batch_key: rows}) to the stored totals.
+# Batches already applied are skipped, so retrying a save is harmless.
+# Returns False if the store does not exist or could not be updated; the
+# next load_aggregates then rebuilds it from the tables.
+def update_aggregates(s3, bucket, batches):
+    try:
+        for attempt in range(MAX_WRITE_ATTEMPTS):
+            store, etag = read_aggregates(s3, bucket)
+            if store is None:
+                return False
+
+            new_batches = {batch_key: rows for batch_key, rows in batches.items() if batch_key not in store['applied_batches']}
+            if not new_batches:
+                return True
+
+            applied_at = datetime.now(timezone.utc)
+            for batch_key, rows in new_batches.items():
+                # A Save All batch holds {sheet_name: rows}
+                rows_by_sheet = rows if isinstance(rows, dict) else {batch_key.split('/')[-2]: rows}
+                for sheet_name, sheet_rows in rows_by_sheet.items():
+                    apply_rows(store, sheet_name, pd.DataFrame(sheet_rows))
+                store['applied_batches'][batch_key] = applied_at.isoformat(timespec='seconds')
+
+            store['applied_batches'] = {
+                batch_key: when for batch_key, when in store['applied_batches'].items()
+                if datetime.fromisoformat(when) >= applied_at - APPLIED_RETENTION
+            }
+
+            if write_aggregates(s3, bucket, store, etag):
+                return True
+            backoff(attempt)
+    except ClientError:
+        pass
+
+    return False
+
+
+def _to_frames(store, version):
+    games = pd.DataFrame(
+        [dict(zip(GAME_KEY, key), **values) for key, values in store['games'].items()],
+        columns=GAME_KEY + GAME_COLUMNS,
+    )
+    players = pd.DataFrame(
+        [dict(zip(PLAYER_KEY, key), **totals) for key, totals in store['players'].items()],
+        columns=PLAYER_KEY + PLAYER_TOTALS,
+    )
+    return Aggregates(games.sort_values(GAME_KEY, ignore_index=True), players, version)
+
+
+# Process-wide cache of the store, revalidated with a conditional GET
+_aggregates_cache = {}
+_cache_lock = threading.Lock()
+
+
+# Totals for data (from load_hockey_data_with_pending). The stored totals
+# are used when they include every batch in data; otherwise they are rebuilt
+# from data and written back unless another writer updated them meanwhile.
+def load_aggregates(s3, bucket, data):
+    cached = _aggregates_cache.get(bucket)
+
+    try:
+        store, etag = read_aggregates(s3, bucket, if_none_match=cached[0] if cached else None)
+    except ClientError as e:
+        if not (cached is not None and is_not_modified_error(e)):
+            raise
+        etag, store, aggregates = cached
+    else:
+        aggregates = _to_frames(store, etag) if store is not None else None
+
+    if store is not None and data.compacted_batches <= store['applied_batches'].keys():
+        _aggregates_cache[bucket] = (etag, store, aggregates)
+        return aggregates
+
+    with _cache_lock:
+        store = rebuild_store(data)
+        response = write_aggregates(s3, bucket, store, etag)
+
+        aggregates = _to_frames(store, response['ETag'] if response else data.version)
+        if response:
+            _aggregates_cache[bucket] = (response['ETag'], store, aggregates)
+
+    return aggregates
+
+
+# Game results for a team, or for a team against one opponent
+def aggregate_games(aggregates, team, opponent="All"):
+    games = aggregates.games[aggregates.games['Team'] == team]
+    if opponent != "All":
+        games = games[games['Opponent'] == opponent]
+    return games
+
+
+# Per-player totals for a team, summed over every opponent unless one is given
+def aggregate_players(aggregates, team, opponent="All"):
+    players = aggregates.players[aggregates.players['Team'] == team]
+    if opponent != "All":
+        players = players[players['Opponent'] == opponent]
+    return players.groupby(['Team', 'JerseyNumber'], as_index=False, observed=True)[PLAYER_TOTALS].sum()
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+
+# Event counts with np.bincount. Every key column is turned into integer
+# codes (a categorical's own codes, otherwise pd.factorize), the codes are
+# combined into one group number per row, and a single bincount counts (or
+# sums the weights of) every group at once. Used for the dashboards' count
+# tables, which are all groupby(...).size() or a sum of cube Counts.
+
+# Group numbers are renumbered densely once the number of possible groups
+# passes this, so the bincount never allocates more than this many slots
+_DENSE_LIMIT = 1 << 22
+
+
+# (codes, number of codes) for one key column. NaN is -1, or its own last
+# code when dropna is False, as groupby(dropna=False) sorts it last.
+def _codes(series, dropna):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, size = series.cat.codes.to_numpy(dtype=np.int64), len(series.cat.categories)
+    else:
+        codes, uniques = pd.factorize(series, sort=True)
+        codes, size = codes.astype(np.int64), len(uniques)
+
+    if not dropna:
+        codes = np.where(codes < 0, size, codes)
+        size += 1
+    return codes, size
+
+
+# One group number per row, ordered like the sorted keys
+def _group_numbers(codes, sizes):
+    groups = np.zeros(len(codes[0]), dtype=np.int64)
+    ngroups = 1
+    for column_codes, size in zip(codes, sizes):
+        groups = groups * size + column_codes
+        ngroups *= size
+        if ngroups > _DENSE_LIMIT:
+            uniques, groups = np.unique(groups, return_inverse=True)
+            groups, ngroups = groups.astype(np.int64), len(uniques)
+    return groups, ngroups
+
+
+def _empty(df, by, name):
+    return df[by].iloc[0:0].reset_index(drop=True).assign(**{name: np.zeros(0, dtype=np.int64)})
+
+
+# The same as df.groupby(by, dropna=dropna).size().reset_index(name=name),
+# or with weights, df.groupby(by, dropna=dropna)[weights].sum().reset_index(name=name)
+def count_by(df, by, name, weights=None, dropna=True):
+    if isinstance(by, str):
+        by = [by]
+
+    if df.empty:
+        return _empty(df, by, name)
+
+    codes, sizes = zip(*(_codes(df[column], dropna) for column in by))
+    rows = np.arange(len(df))
+    if dropna:
+        rows = rows[np.all([column_codes >= 0 for column_codes in codes], axis=0)]
+        codes = [column_codes[rows] for column_codes in codes]
+        if len(rows) == 0:
+            return _empty(df, by, name)
+
+    groups, ngroups = _group_numbers(codes, sizes)
+
+    occupied = np.bincount(groups, minlength=ngroups)
+    if weights is None:
+        totals = occupied
+    else:
+        values = df[weights].to_numpy(dtype=float, na_value=0)[rows]
+        totals = np.bincount(groups, weights=values, minlength=ngroups)
+        if pd.api.types.is_integer_dtype(df[weights]):
+            totals = totals.astype(np.int64)
+
+    # The first row of every group supplies its key values
+    present = np.flatnonzero(occupied)
+    first_row = np.empty(ngroups, dtype=np.int64)
+    first_row[groups[::-1]] = rows[::-1]
+
+    result = df[by].iloc[first_row[present]].reset_index(drop=True)
+    result[name] = totals[present]
+    return result
@@ -0,0 +1,347 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from botocore.exceptions import ClientError
+
+from hockey_data import SHEET_NAMES, conditional_put, is_missing_error
+from schema import apply_schema
+from table_store import COMPACTED_RETENTION, fold_batches_into_tables, load_hockey_data_cached
+
+
+# Every save in shots.py is written as a small immutable CSV batch under
+# events/pending/<Sheet>/. A Save All is written as one JSON batch holding
+# the rows of every sheet, {sheet_name: rows}, under events/pending/Game/,
+# so the whole game appears at once or not at all. compact.py folds pending
+# batches into their tables and moves them to events/archive/, which keeps
+# them as backups. events/keys/ indexes the batches by content, so a save
+# is written once; expire_batch_index deletes old entries.
+EVENTS_PREFIX = 'events'
+PENDING_PREFIX = f'{EVENTS_PREFIX}/pending'
+ARCHIVE_PREFIX = f'{EVENTS_PREFIX}/archive'
+KEYS_PREFIX = f'{EVENTS_PREFIX}/keys'
+
+GAME_BATCH = 'Game'
+
+# An index entry is what stops the same rows being saved again under a new
+# key: a double click, a retry after a timeout, or a Save All after single
+# saves. A batch sent again under its own key, however late, is found in
+# the archive without it, so entries of batches that are no longer pending
+# are deleted once they are this old. The limit that follows: the same rows
+# saved again under a new key more than INDEX_RETENTION after the first
+# save are written as a new batch.
+INDEX_RETENTION = COMPACTED_RETENTION
+
+# Streamlit reruns the page on every widget change, so the pending listing
+# is shared for this many seconds instead of LISTed on every rerun. Batches
+# this process writes show up at once; other processes' saves within this
+# long.
+PENDING_LIST_TTL = 5.0
+
+
+# Sheet a batch belongs to (GAME_BATCH for a Save All), from
+# events/pending/<Sheet>/<name>.csv
+def batch_sheet_name(batch_key):
+    return batch_key.split('/')[-2]
+
+
+def is_game_batch(batch_key):
+    return batch_sheet_name(batch_key) == GAME_BATCH
+
+
+# Rows come from DataFrames and the journal with numpy scalars and pandas NA
+def json_value(value):
+    if value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Key of the event batch for rows. Batch names start with a UTC timestamp so
+# they list in save order, and end with a digest of the sheet and rows (which
+# carry the game and period), so saving the same rows again - a double click,
+# or a retry after a timeout - gives the same digest. salt keeps rows that
+# really were recorded twice, like two identical live taps, apart.
+def batch_digest(sheet_name, rows, salt=''):
+    content = json.dumps([sheet_name, salt, rows], sort_keys=True, default=json_value)
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+# rows is {sheet_name: rows} for a GAME_BATCH
+def new_batch_key(sheet_name, rows, team, current_time=None, salt=''):
+    if current_time is None:
+        current_time = datetime.now(timezone.utc).strftime("%Y-%m-%d_%H-%M-%S-%f")
+    extension = 'json' if sheet_name == GAME_BATCH else 'csv'
+    return f"{PENDING_PREFIX}/{sheet_name}/{current_time}_{team}_{batch_digest(sheet_name, rows, salt)}.{extension}"
+
+
+# Where compact_event_log moves a pending batch
+def archived_batch_key(batch_key):
+    return ARCHIVE_PREFIX + batch_key[len(PENDING_PREFIX):]
+
+
+# The key index: one tiny object per digest, events/keys/<Sheet>/<digest>,
+# holding the key of the batch first written with that digest. Checking it
+# is one request, however many rows the tables hold.
+def _index_key(sheet_name, digest):
+    return f"{KEYS_PREFIX}/{sheet_name}/{digest}"
+
+
+def _batch_index_key(batch_key):
+    digest = batch_key.split('/')[-1].rsplit('_', 1)[-1].split('.')[0]
+    return _index_key(batch_sheet_name(batch_key), digest)
+
+
+def _batch_exists(s3, bucket, key):
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if is_missing_error(e):
+            return False
+        raise
+    return True
+
+
+def _indexed_batch(s3, bucket, index_key):
+    try:
+        return s3.get_object(Bucket=bucket, Key=index_key)['Body'].read().decode()
+    except ClientError as e:
+        if is_missing_error(e):
+            return None
+        raise
+
+
+# A sheet of a Save All whose rows were already saved in another batch,
+# on their own or in another Save All, is left out of the game batch
+def _saved_elsewhere(s3, bucket, batch_key, sheet_name, rows):
+    other_key = _indexed_batch(s3, bucket, _index_key(sheet_name, batch_digest(sheet_name, rows)))
+    if other_key is None or other_key == batch_key:
+        return False
+    return _batch_exists(s3, bucket, other_key) or _batch_exists(s3, bucket, archived_batch_key(other_key))
+
+
+def _batch_body(batch_key, rows):
+    if is_game_batch(batch_key):
+        return json.dumps(rows, default=json_value).encode()
+
+    csv_buffer = BytesIO()
+    pd.DataFrame(rows).to_csv(csv_buffer, index=False)
+    return csv_buffer.getvalue()
+
+
+# Write rows as the event batch batch_key, unless the same rows were saved
+# before. Returns (key the rows are stored under, rows of that batch):
+# sending a batch again, or saving the same rows under a new timestamp
+# within INDEX_RETENTION, never adds them twice, whether the first batch is
+# still pending or already compacted into the archive. Returns rows None
+# when nothing of
+# the save is left to add.
+def put_event_batch(s3, bucket, batch_key, rows):
+    index_key = _batch_index_key(batch_key)
+    indexed_key = None
+    while indexed_key is None and not conditional_put(s3, bucket, index_key, batch_key.encode(), None):
+        # None if the entry was expired since the put found it; claim it again
+        indexed_key = _indexed_batch(s3, bucket, index_key)
+
+    if indexed_key is not None:
+        if is_game_batch(indexed_key) and not is_game_batch(batch_key):
+            # Saved before as a sheet of a Save All, which is only indexed
+            # by sheet once its game batch is written
+            return indexed_key, None
+
+        # Write the batch the index names; it is missing only if a save
+        # stopped between the index and the batch
+        batch_key = indexed_key
+
+    if _batch_exists(s3, bucket, archived_batch_key(batch_key)):
+        # Which sheets a game batch kept is in the batch itself
+        return batch_key, None if is_game_batch(batch_key) else rows
+
+    if is_game_batch(batch_key):
+        rows = {
+            sheet_name: sheet_rows for sheet_name, sheet_rows in rows.items()
+            if not _saved_elsewhere(s3, bucket, batch_key, sheet_name, sheet_rows)
+        }
+
+    # If-None-Match: an existing batch is never replaced
+    conditional_put(s3, bucket, batch_key, _batch_body(batch_key, rows), None)
+    _pending_cache.pop(bucket, None)
+
+    if is_game_batch(batch_key):
+        # Saving one of these sheets again on its own finds it in this batch
+        for sheet_name, sheet_rows in rows.items():
+            conditional_put(s3, bucket, _index_key(sheet_name, batch_digest(sheet_name, sheet_rows)), batch_key.encode(), None)
+        if not rows:
+            return batch_key, None
+
+    return batch_key, rows
+
+
+def list_pending_batches(s3, bucket):
+    batch_keys = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=f"{PENDING_PREFIX}/"):
+        batch_keys.extend(obj['Key'] for obj in page.get('Contents', []))
+
+    return sorted(batch_keys, key=lambda batch_key: batch_key.split('/')[-1])
+
+
+# The rows of a batch as {sheet_name: DataFrame}
+def read_event_batch(s3, bucket, batch_key):
+    body = s3.get_object(Bucket=bucket, Key=batch_key)['Body'].read()
+    if is_game_batch(batch_key):
+        return {sheet_name: apply_schema(sheet_name, pd.DataFrame(rows)) for sheet_name, rows in json.loads(body).items()}
+    return {batch_sheet_name(batch_key): apply_schema(batch_sheet_name(batch_key), pd.read_csv(BytesIO(body)))}
+
+
+# Fold every pending batch into its tables, then archive the folded batches.
+# Only the tables with new batches are rewritten, so compacting Faceoff
+# batches never rewrites Shots. Returns the number of batches that were
+# added to tables.
+def compact_event_log(s3, bucket):
+    pending = list_pending_batches(s3, bucket)
+    if not pending:
+        return 0
+
+    batches = {}
+    batches_by_table = {}
+    for batch_key in pending:
+        try:
+            batches[batch_key] = read_event_batch(s3, bucket, batch_key)
+        except ClientError as e:
+            # Archived by a concurrent compaction since it was listed
+            if is_missing_error(e):
+                continue
+            raise
+        for table_name in batches[batch_key]:
+            batches_by_table.setdefault(table_name, []).append(batch_key)
+
+    compacted = fold_batches_into_tables(
+        s3, bucket, batches_by_table, lambda table_name, batch_key: batches[batch_key][table_name]
+    )
+
+    for batch_key in batches:
+        archive_key = archived_batch_key(batch_key)
+        try:
+            s3.copy_object(Bucket=bucket, Key=archive_key, CopySource={'Bucket': bucket, 'Key': batch_key})
+        except ClientError as e:
+            # Already archived by a concurrent compaction
+            if is_missing_error(e):
+                continue
+            raise
+        s3.delete_object(Bucket=bucket, Key=batch_key)
+
+    _pending_cache.pop(bucket, None)
+    return compacted
+
+
+# Delete the index entries older than INDEX_RETENTION whose batch is no
+# longer pending. Returns the number of entries deleted.
+def expire_batch_index(s3, bucket):
+    pending = set(list_pending_batches(s3, bucket))
+    cutoff = datetime.now(timezone.utc) - INDEX_RETENTION
+
+    expired = 0
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=f"{KEYS_PREFIX}/"):
+        for obj in page.get('Contents', []):
+            if obj['LastModified'] >= cutoff:
+                continue
+            batch_key = _indexed_batch(s3, bucket, obj['Key'])
+            if batch_key is None or batch_key in pending:
+                continue
+            s3.delete_object(Bucket=bucket, Key=obj['Key'])
+            expired += 1
+
+    return expired
+
+
+# Batches are immutable, so each one is downloaded once per process
+_batch_cache = {}
+_merged_cache = {}
+_pending_cache = {}  # bucket -> (time listed, pending batch keys)
+_cache_lock = threading.Lock()
+
+
+def _list_pending_cached(s3, bucket):
+    cached = _pending_cache.get(bucket)
+    if cached is not None and time.monotonic() - cached[0] < PENDING_LIST_TTL:
+        return cached[1]
+
+    listed_at = time.monotonic()
+    pending = list_pending_batches(s3, bucket)
+    _pending_cache[bucket] = (listed_at, pending)
+    return pending
+
+
+def _cached_event_batch(s3, bucket, batch_key):
+    sheets = _batch_cache.get(batch_key)
+    if sheets is None:
+        sheets = read_event_batch(s3, bucket, batch_key)
+        _batch_cache[batch_key] = sheets
+    return sheets
+
+
+def _merge_pending(s3, bucket, base, pending):
+    batches = {sheet_name: [] for sheet_name in SHEET_NAMES}
+    for batch_key in pending:
+        for sheet_name, df in _cached_event_batch(s3, bucket, batch_key).items():
+            if sheet_name in batches:
+                batches[sheet_name].append(df)
+
+    sheets = {}
+    for sheet_name, field in zip(SHEET_NAMES, base._fields):
+        frames = [getattr(base, field)] + batches[sheet_name]
+        frames = [df for df in frames if not df.empty]
+        if len(frames) > 1:
+            # Categories differ between frames, so the concatenation is typed again
+            sheets[field] = apply_schema(sheet_name, pd.concat(frames, ignore_index=True))
+        elif frames:
+            sheets[field] = frames[0]
+
+    return base._replace(**sheets)
+
+
+# Load the compacted tables (or the workbook, before migration) and append
+# any batches that compact.py has not folded in yet. The version of the
+# result changes whenever a table or the set of pending batches changes.
+# Its compacted_batches lists every batch whose rows it includes. The
+# pending batches are listed at most every PENDING_LIST_TTL seconds.
+def load_hockey_data_with_pending(s3, bucket, file_key, retries=1):
+    base = load_hockey_data_cached(s3, bucket, file_key)
+    pending = [batch_key for batch_key in _list_pending_cached(s3, bucket) if batch_key not in base.compacted_batches]
+    if not pending:
+        return base
+
+    digest = hashlib.sha1("\n".join(pending).encode()).hexdigest()[:12]
+    version = f"{base.version}+{digest}"
+
+    cached = _merged_cache.get((bucket, file_key))
+    if cached is not None and cached.version == version:
+        return cached
+
+    try:
+        with _cache_lock:
+            data = _merge_pending(s3, bucket, base, pending)._replace(
+                version=version, compacted_batches=base.compacted_batches | frozenset(pending)
+            )
+            _merged_cache[(bucket, file_key)] = data
+
+            # Forget batches that have since been compacted
+            for batch_key in set(_batch_cache) - set(pending):
+                del _batch_cache[batch_key]
+    except ClientError as e:
+        # A batch was archived by compact.py after we listed it, so the
+        # tables have changed underneath us; start again from the new ones
+        if is_missing_error(e) and retries > 0:
+            _pending_cache.pop(bucket, None)
+            return load_hockey_data_with_pending(s3, bucket, file_key, retries - 1)
+        raise
+
+    return data
@@ -0,0 +1,222 @@
+import threading
+from typing import NamedTuple
+
+import pandas as pd
+
+from counts import count_by
+from roster_index import build_roster_index, with_roster
+
+
+# The dashboards work on "enriched" copies of the event tables: Stevenson
+# rows get the player's name and position from the Roster, and GameDate is
+# a 'YYYY-MM-DD' string. Building them takes several merges, so they are
+# built once per data version (see HockeyData.version) and shared by every
+# rerun and session. Names are looked up in a roster index keyed by
+# (Team, JerseyNumber) (see roster_index.py) rather than merged in.
+#
+# They are also split up front by team and by (team, opponent), so the
+# dashboards look up the rows for the selected team and opponent instead
+# of filtering every table on each rerun.
+#
+# Every game is a row of the games table with an integer GameID, which the
+# other tables carry, so results are stored once per game instead of on
+# every goal row and joins are on one integer rather than the
+# (GameDate, Team, Opponent) strings.
+#
+# Shots and penalties are additionally rolled up into event counts over the
+# dimensions the charts group by, so a chart sums a few cube rows instead of
+# counting raw events, however many seasons of shots are stored. The sums
+# over the cubes are counted with np.bincount (see counts.py); the cubes
+# themselves group on many columns at once, where pandas' groupby is as fast
+# (see benchmarks/bench_counts.py), so they are built with it.
+
+ALL_OPPONENTS = "All"
+
+GAME_KEY = ['GameDate', 'Team', 'Opponent']
+GAME_RESULT_COLUMNS = ['Home', 'Win', 'ScoreStevenson', 'ScoreOpponent']
+
+PLAYER_COLUMNS = ['JerseyNumber', 'FirstName', 'LastName', 'Position']
+SHOT_DIMENSIONS = ['GameID', 'Team', 'Opponent', 'GameDate', 'Period', 'ShootingTeam', 'ShootZone'] + PLAYER_COLUMNS
+PENALTY_DIMENSIONS = ['GameID', 'Team', 'Opponent', 'GameDate', 'Period', 'PenaltyTeam', 'PenaltyCode'] + PLAYER_COLUMNS
+
+
+# Rows of every fact table for one team, or one team against one opponent
+class FactSlice(NamedTuple):
+    games: pd.DataFrame  # one row per game: GameID, GAME_KEY, GAME_RESULT_COLUMNS, HasResult
+    scoring: pd.DataFrame
+    penalties: pd.DataFrame
+    shots: pd.DataFrame
+    faceoff: pd.DataFrame
+    goalie: pd.DataFrame
+    shot_counts: pd.DataFrame  # rollup cube over SHOT_DIMENSIONS
+    penalty_counts: pd.DataFrame  # rollup cube over PENALTY_DIMENSIONS
+
+
+class FactTables(NamedTuple):
+    games: pd.DataFrame
+    scoring: pd.DataFrame
+    penalties: pd.DataFrame
+    shots: pd.DataFrame
+    faceoff: pd.DataFrame
+    goalie: pd.DataFrame
+    shot_counts: pd.DataFrame
+    penalty_counts: pd.DataFrame
+    version: str = ""
+    partitions: dict = None  # {team: FactSlice} and {(team, opponent): FactSlice}
+    opponents: dict = None  # {team: [opponents in the order they were first played]}
+    roster: object = None  # RosterIndex of data.roster
+
+
+# Add the roster columns to the rows where team_column is Stevenson, looking
+# up jersey_column as the player's JerseyNumber, and keep the other rows as they are
+def _enrich(df, roster, team_column, jersey_column):
+    is_stevenson = df[team_column] == 'Stevenson'
+
+    columns = PLAYER_COLUMNS if jersey_column != 'JerseyNumber' else PLAYER_COLUMNS[1:]
+    looked_up = with_roster(df[is_stevenson], roster, jersey_column, columns)
+    enriched = pd.concat([looked_up, df[~is_stevenson]], ignore_index=True)
+
+    enriched['GameDate'] = pd.to_datetime(enriched['GameDate']).dt.strftime('%Y-%m-%d')
+    return enriched
+
+
+def _game_key(df):
+    return df[GAME_KEY].assign(GameDate=pd.to_datetime(df['GameDate']).dt.strftime('%Y-%m-%d'))
+
+
+# One row per game played, numbered in date order. The result columns come
+# from the game's last Scoring row in save order (live entry records the
+# running score on every goal); HasResult is False for games that only have
+# shots, penalties or faceoffs recorded so far.
+def _build_games(scoring, tables):
+    keys = [_game_key(df) for df in [scoring] + tables if not df.empty]
+    if not keys:
+        return pd.DataFrame(columns=['GameID'] + GAME_KEY + GAME_RESULT_COLUMNS + ['HasResult'])
+
+    games = pd.concat(keys).dropna().drop_duplicates().sort_values(GAME_KEY, ignore_index=True)
+    games.insert(0, 'GameID', range(1, len(games) + 1))
+
+    results = pd.DataFrame(columns=GAME_KEY + GAME_RESULT_COLUMNS)
+    if not scoring.empty:
+        results = scoring.assign(GameDate=_game_key(scoring)['GameDate']).drop_duplicates(GAME_KEY, keep='last')[GAME_KEY + GAME_RESULT_COLUMNS]
+    games = pd.merge(games, results.assign(HasResult=True), how='left', on=GAME_KEY)
+    games['HasResult'] = games['HasResult'].eq(True)
+
+    return games
+
+
+def _with_game_ids(df, games):
+    if df.empty:
+        return df.assign(GameID=pd.Series(dtype='Int64'))
+
+    game_ids = pd.merge(_game_key(df), games[['GameID'] + GAME_KEY], how='left', on=GAME_KEY)['GameID']
+    return df.assign(GameID=game_ids.astype('Int64').values)
+
+
+# Number of events for every combination of dimensions that occurs. NaN is
+# kept as a value (e.g. opponent shots have no player name) so that slices
+# of the cube add up to the raw rows.
+def _rollup_cube(df, dimensions):
+    dimensions = [dimension for dimension in dimensions if dimension in df.columns]
+    if df.empty:
+        return count_by(df, dimensions, 'Count')
+    return df.groupby(dimensions, dropna=False, observed=True).size().reset_index(name='Count')
+
+
+# Count events in a slice of a cube; the same as rows.groupby(by).size()
+# on the raw rows of the slice
+def rollup(cube, by, name):
+    return count_by(cube, by, name, weights='Count')
+
+
+def _partition(df, keys):
+    if df.empty or any(key not in df.columns for key in keys):
+        return {}
+    return {group: rows for group, rows in df.groupby(keys if len(keys) > 1 else keys[0], sort=False, observed=True)}
+
+
+def _build_partitions(tables):
+    empty = FactSlice(*(df.iloc[0:0] for df in tables))
+
+    by_team = [_partition(df, ['Team']) for df in tables]
+    by_opponent = [_partition(df, ['Team', 'Opponent']) for df in tables]
+
+    partitions = {}
+    for parts in (by_team, by_opponent):
+        for key in set().union(*parts):
+            partitions[key] = FactSlice(*(part.get(key, empty[i]) for i, part in enumerate(parts)))
+
+    # The opponent dropdown lists scoring, then shots, penalties and faceoff opponents
+    opponents = {}
+    for team, team_slice in partitions.items():
+        if isinstance(team, tuple):
+            continue
+        frames = [df['Opponent'] for df in (team_slice.scoring, team_slice.shots, team_slice.penalties, team_slice.faceoff) if 'Opponent' in df.columns]
+        opponents[team] = list(pd.concat(frames).drop_duplicates()) if frames else []
+
+    return partitions, opponents, empty
+
+
+def build_fact_tables(data):
+    roster = build_roster_index(data.roster)
+
+    # Every faceoff row is a Stevenson player, so they are all looked up
+    faceoff = data.faceoff
+    if not faceoff.empty:
+        faceoff = with_roster(faceoff, roster)
+
+    scoring = _enrich(data.scoring, roster, 'ScoringTeam', 'Goal')
+    penalties = _enrich(data.penalties, roster, 'PenaltyTeam', 'JerseyNumber')
+    shots = _enrich(data.shots, roster, 'ShootingTeam', 'JerseyNumber')
+
+    # Enriching reorders the rows, so results are read from the rows as saved
+    games = _build_games(data.scoring, [penalties, shots, faceoff, data.goalie])
+    scoring, penalties, shots, faceoff, goalie = (_with_game_ids(df, games) for df in (scoring, penalties, shots, faceoff, data.goalie))
+
+    tables = FactSlice(
+        games=games,
+        scoring=scoring,
+        penalties=penalties,
+        shots=shots,
+        faceoff=faceoff,
+        goalie=goalie,
+        shot_counts=_rollup_cube(shots, SHOT_DIMENSIONS),
+        penalty_counts=_rollup_cube(penalties, PENALTY_DIMENSIONS),
+    )
+    partitions, opponents, empty = _build_partitions(tables)
+    partitions[None] = empty
+
+    return FactTables(*tables, version=data.version, partitions=partitions, opponents=opponents, roster=roster)
+
+
+# Rows for a team, or for a team against one opponent. Unknown teams and
+# opponents get empty tables with the usual columns.
+def fact_slice(facts, team, opponent=ALL_OPPONENTS):
+    key = team if opponent == ALL_OPPONENTS else (team, opponent)
+    return facts.partitions.get(key, facts.partitions[None])
+
+
+def team_opponents(facts, team):
+    return facts.opponents.get(team, [])
+
+
+# Latest fact tables per process. Like the tables they are built from, the
+# cached DataFrames are shared and must not be mutated.
+_fact_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load_fact_tables(data):
+    cached = _fact_cache.get('latest')
+    if cached is not None and cached.version == data.version:
+        return cached
+
+    with _cache_lock:
+        cached = _fact_cache.get('latest')
+        if cached is not None and cached.version == data.version:
+            return cached
+
+        facts = build_fact_tables(data)
+        _fact_cache['latest'] = facts
+
+    return facts
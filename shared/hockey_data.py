@@ -0,0 +1,112 @@
+import random
+import time
+from io import BytesIO
+from typing import NamedTuple
+
+import pandas as pd
+from botocore.exceptions import ClientError
+
+from schema import apply_schema
+
+
+# Sheets stored in Stevenson_Hockey.xlsx, in workbook order. Since the
+# migration to per-table storage each sheet is also a table in table_store.
+SHEET_NAMES = ["Roster", "Scoring", "Penalties", "Shots", "Faceoff", "Goalie"]
+
+# Hidden sheet listing the event batches already folded into the workbook
+COMPACTED_SHEET = "_Compacted"
+
+# Conditional writes that lose a race are retried this many times
+MAX_WRITE_ATTEMPTS = 5
+
+
+class WriteConflictError(Exception):
+    pass
+
+
+class HockeyData(NamedTuple):
+    roster: pd.DataFrame
+    scoring: pd.DataFrame
+    penalties: pd.DataFrame
+    shots: pd.DataFrame
+    faceoff: pd.DataFrame
+    goalie: pd.DataFrame
+    version: str = ""  # ETag of the manifest (or workbook) the sheets were read from
+    compacted_batches: frozenset = frozenset()  # event batches included in the sheets
+
+
+# Parse every sheet of an in-memory workbook with a single openpyxl load
+def parse_workbook(excel_data):
+    with pd.ExcelFile(BytesIO(excel_data)) as workbook:
+        sheets = {}
+        for sheet_name in SHEET_NAMES:
+            if sheet_name in workbook.sheet_names:
+                sheets[sheet_name] = workbook.parse(sheet_name)
+            else:
+                # Older workbooks do not have every sheet yet (e.g. Goalie)
+                sheets[sheet_name] = pd.DataFrame()
+
+        compacted_batches = frozenset()
+        if COMPACTED_SHEET in workbook.sheet_names:
+            compacted_batches = frozenset(workbook.parse(COMPACTED_SHEET)['BatchKey'].dropna())
+
+    return HockeyData(*(apply_schema(sheet_name, sheets[sheet_name]) for sheet_name in SHEET_NAMES), compacted_batches=compacted_batches)
+
+
+# Download the workbook from S3 once and parse all sheets in one pass
+def load_hockey_data(s3, bucket, file_key):
+    obj = s3.get_object(Bucket=bucket, Key=file_key)
+    return parse_workbook(obj['Body'].read())._replace(version=obj['ETag'])
+
+
+# Parquet needs one type per column, but sheets written by hand and by
+# shots.py mix types (e.g. dates and 'YYYY-MM-DD' strings, ints and '0')
+def normalize_frame(df):
+    df = df.copy()
+    df.columns = [str(col) for col in df.columns]
+
+    for col in df.columns:
+        if df[col].dtype != object or df[col].dropna().map(type).nunique() <= 1:
+            continue
+
+        if col == 'GameDate':
+            df[col] = pd.to_datetime(df[col], errors='coerce', format='mixed')
+        else:
+            try:
+                df[col] = pd.to_numeric(df[col])
+            except (ValueError, TypeError):
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+
+    return df
+
+
+def is_missing_error(error):
+    return error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey')
+
+
+def is_not_modified_error(error):
+    return error.response.get('Error', {}).get('Code') in ('304', 'NotModified')
+
+
+# 412 when the ETag no longer matches, 409 when a concurrent conditional write is in flight
+def is_conflict_error(error):
+    return error.response.get('Error', {}).get('Code') in ('PreconditionFailed', 'ConditionalRequestConflict', '412', '409')
+
+
+# Exponential backoff with jitter between retries of a conflicting write
+def backoff(attempt):
+    time.sleep(min(2.0, 0.1 * 2 ** attempt) * random.uniform(0.5, 1.0))
+
+
+# Write an object only if it still has expected_etag, or only if it does not
+# exist yet when expected_etag is None. Returns the put response, or False
+# if another writer got there first.
+def conditional_put(s3, bucket, key, body, expected_etag):
+    try:
+        if expected_etag is None:
+            return s3.put_object(Bucket=bucket, Key=key, Body=body, IfNoneMatch='*')
+        return s3.put_object(Bucket=bucket, Key=key, Body=body, IfMatch=expected_etag)
+    except ClientError as e:
+        if is_conflict_error(e):
+            return False
+        raise
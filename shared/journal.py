@@ -0,0 +1,287 @@
+import json
+import os
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from aggregates import update_aggregates
+from event_log import GAME_BATCH, json_value, new_batch_key, put_event_batch
+
+
+# Every save in shots.py, and every tap of live play-by-play entry, goes to
+# a local journal first (a JSON-lines file per game) and returns at once. A
+# background thread sends the journal to S3, retrying every FLUSH_INTERVAL
+# seconds until it gets through, so entry keeps working while S3 is
+# unreachable and nothing saved is lost. Opening the journal again (after a
+# browser refresh, a lost connection or a restart) replays what was never
+# acked. The records are:
+#
+#   {"journal": id}                              first record: a random id of
+#                                                this journal file
+#   {"event": id, "sheet": ..., "row": {...}}    a live tap
+#   {"batch": key, "sheet": ..., "rows": [...], "events": [ids]}
+#                                                rows to send as the event batch key
+#                                                (for a Save All, sheet is GAME_BATCH
+#                                                and rows is {sheet_name: rows})
+#   {"ack": key}                                 that batch is in S3
+#   {"ack": [ids]}                               those live taps are in S3
+#
+# Once everything is in S3 the thread stops and the journal is rewritten
+# to just its live taps (which give the running score), or deleted if it
+# has none, so journals only hold what is still to be sent.
+#
+# Live taps are sealed into one batch per sheet every FLUSH_INTERVAL seconds,
+# or as soon as FLUSH_EVENTS are waiting. A batch's key is chosen when it is
+# journaled, from the rows, so sending it again after a crash or a lost ack,
+# or saving the same rows twice, finds the batch already written
+# (put_event_batch) and never adds its rows twice.
+JOURNAL_DIR = os.environ.get('HOCKEY_LIVE_JOURNAL_DIR', '.live_journal')
+
+FLUSH_INTERVAL = 5.0
+FLUSH_EVENTS = 10
+
+
+class Journal:
+    def __init__(self, path, send):
+        self.path = path
+        self._send = send  # send(batch_key, rows), raises if the batch did not get to S3
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+        self._id = None  # salts the keys of live tap batches, see _seal
+        self.events = []  # every live (event_id, sheet_name, row) recorded, in order
+        self._loose = {}  # event_id -> (sheet_name, row) not in a batch yet
+        self._batches = {}  # batch_key -> rows not acked yet, in save order
+        self.last_error = None
+
+        self._thread = None  # the drain thread, while there is something to send
+
+        self._replay()
+        if self._id is None:
+            self._id = uuid.uuid4().hex
+        with self._lock:
+            if self._batches or self._loose:
+                self._start()
+            else:
+                self._compact()
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A write cut short by a crash; everything before it is intact
+                    continue
+                if 'journal' in record:
+                    self._id = record['journal']
+                elif 'event' in record or 'id' in record:
+                    event_id = record.get('event', record.get('id'))
+                    self.events.append((event_id, record['sheet'], record['row']))
+                    self._loose[event_id] = (record['sheet'], record['row'])
+                elif 'batch' in record:
+                    self._batches[record['batch']] = record['rows']
+                    for event_id in record['events']:
+                        self._loose.pop(event_id, None)
+                elif isinstance(record['ack'], list):
+                    for event_id in record['ack']:
+                        self._loose.pop(event_id, None)
+                else:
+                    self._batches.pop(record['ack'], None)
+
+    # Append records with one write, so a save is journaled whole or, if
+    # a value cannot be stored, not at all
+    def _write(self, *records):
+        lines = "".join(json.dumps(record, default=json_value) + "\n" for record in records)
+        if not os.path.exists(self.path):
+            lines = json.dumps({'journal': self._id}) + "\n" + lines
+        with open(self.path, 'a') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    # Record one live tap; it is sent with the next batch of taps
+    def append(self, sheet_name, row):
+        with self._lock:
+            event_id = len(self.events) + 1
+            self._write({'event': event_id, 'sheet': sheet_name, 'row': row})
+            self.events.append((event_id, sheet_name, row))
+            self._loose[event_id] = (sheet_name, row)
+            waiting = len(self._loose)
+            self._start()
+
+        if waiting >= FLUSH_EVENTS:
+            self._wakeup.set()
+
+    # Journal the rows of a save and send them in the background: one event
+    # batch for one sheet, or a game batch holding every sheet of a Save
+    # All. Returns the batch key.
+    def save(self, rows_by_sheet, team):
+        if len(rows_by_sheet) == 1:
+            (sheet_name, rows), = rows_by_sheet.items()
+        else:
+            sheet_name, rows = GAME_BATCH, rows_by_sheet
+        batch_key = new_batch_key(sheet_name, rows, team)
+
+        with self._lock:
+            self._write({'batch': batch_key, 'sheet': sheet_name, 'rows': rows, 'events': []})
+            self._batches[batch_key] = rows
+            self._start()
+
+        self._wakeup.set()
+        return batch_key
+
+    # Turn the live taps waiting now into one batch per sheet
+    def _seal(self):
+        with self._lock:
+            if not self._loose:
+                return
+
+            events_by_sheet = {}
+            for event_id, (sheet_name, row) in self._loose.items():
+                events_by_sheet.setdefault(sheet_name, []).append((event_id, row))
+
+            current_time = datetime.now(timezone.utc).strftime("%Y-%m-%d_%H-%M-%S-%f")
+            records = []
+            for sheet_name, events in events_by_sheet.items():
+                rows, event_ids = [row for _, row in events], [event_id for event_id, _ in events]
+                # Identical taps are separate events, unlike a save made twice.
+                # Event ids start again at 1 in a new journal file (after it
+                # was sent and deleted, or lost with the disk), so the file's
+                # random id keeps them apart from earlier taps of the game.
+                salt = f"{self._id}:{event_ids}"
+                batch_key = new_batch_key(sheet_name, rows, events[0][1]['Team'], current_time, salt)
+                records.append({'batch': batch_key, 'sheet': sheet_name, 'rows': rows, 'events': event_ids})
+
+            self._write(*records)
+            for record in records:
+                self._batches[record['batch']] = record['rows']
+            self._loose.clear()
+
+    # (batches, live taps) not in S3 yet
+    def backlog(self):
+        with self._lock:
+            return len(self._batches), len(self._loose)
+
+    # Send every batch waiting now, in save order, stopping at the first
+    # failure so the rest are retried in order. Returns the number of batches acked.
+    def drain(self):
+        with self._drain_lock:
+            self._seal()
+            with self._lock:
+                batches = list(self._batches.items())
+
+            for sent, (batch_key, rows) in enumerate(batches):
+                try:
+                    self._send(batch_key, rows)
+                except Exception as e:
+                    self.last_error = e
+                    return sent
+
+                with self._lock:
+                    self._write({'ack': batch_key})
+                    self._batches.pop(batch_key, None)
+
+            self.last_error = None
+            return len(batches)
+
+    # Called with _lock held
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"journal-{os.path.basename(self.path)}", daemon=True)
+            self._thread.start()
+
+    # Rewrite the journal as its live taps, all sent; called with _lock held
+    # once nothing is waiting
+    def _compact(self):
+        if not self.events:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+                # Taps recorded from now on start a new file, numbered from 1
+                self._id = uuid.uuid4().hex
+            return
+
+        records = [{'journal': self._id}]
+        records += [{'event': event_id, 'sheet': sheet_name, 'row': row} for event_id, sheet_name, row in self.events]
+        records.append({'ack': [event_id for event_id, _, _ in self.events]})
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("".join(json.dumps(record, default=json_value) + "\n" for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(FLUSH_INTERVAL)
+            self._wakeup.clear()
+            self.drain()
+
+            with self._lock:
+                if not self._batches and not self._loose:
+                    self._compact()
+                    self._thread = None
+                    return
+
+
+# One journal per game per process, shared by every session that opens the
+# same game
+_journals = {}
+_journals_lock = threading.Lock()
+_reopened = False
+
+
+def _journal_path(team, opponent, game_date):
+    name = "_".join(re.sub(r'[^A-Za-z0-9-]+', '-', str(part)) for part in (game_date, team, opponent))
+    return os.path.join(JOURNAL_DIR, f"{name}.jsonl")
+
+
+def _new_journal(s3, bucket, path):
+    def send(batch_key, rows):
+        # The rows may already be stored under an earlier batch's key
+        batch_key, rows = put_event_batch(s3, bucket, batch_key, rows)
+        if rows is None:
+            return
+        try:
+            update_aggregates(s3, bucket, {batch_key: rows})
+        except Exception:
+            # The batch is written; load_aggregates catches up on it
+            pass
+
+    return Journal(path, send)
+
+
+# The journal of a game. The first call also reopens the journals left on
+# disk with something still to send, so batches saved for other games
+# before a restart are still sent.
+def open_journal(s3, bucket, team, opponent, game_date):
+    global _reopened
+
+    with _journals_lock:
+        if not _reopened:
+            os.makedirs(JOURNAL_DIR, exist_ok=True)
+            for name in sorted(os.listdir(JOURNAL_DIR)):
+                path = os.path.join(JOURNAL_DIR, name)
+                if name.endswith('.jsonl') and path not in _journals:
+                    journal = _new_journal(s3, bucket, path)
+                    if journal.backlog() != (0, 0):
+                        _journals[path] = journal
+            _reopened = True
+
+        path = _journal_path(team, opponent, game_date)
+        if path not in _journals:
+            _journals[path] = _new_journal(s3, bucket, path)
+        return _journals[path]
+
+
+# {journal file name: (batches, live taps, last error)} for every open journal
+def journal_backlog():
+    with _journals_lock:
+        journals = list(_journals.values())
+    return {os.path.basename(journal.path): (*journal.backlog(), journal.last_error) for journal in journals}
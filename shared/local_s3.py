@@ -0,0 +1,194 @@
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from io import BytesIO
+
+from botocore.exceptions import ClientError, OperationNotPageableError
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads in one process are serialised
+    fcntl = None
+
+
+# Local stand-in for the subset of the boto3 S3 client used by the apps,
+# storing objects as files under <root>/<bucket>/<key>. It implements the
+# same conditional-write semantics as S3 (If-Match / If-None-Match on
+# put_object, If-None-Match on get_object), serialised across threads and
+# processes, so concurrent savers and compactions can be run against it
+# without an AWS account. Listings are paged like S3's (MaxKeys,
+# ContinuationToken); list_objects_v2 is the only paginated operation the
+# apps use, so get_paginator supports only that one.
+
+
+class _Body:
+    def __init__(self, data):
+        self._buffer = BytesIO(data)
+
+    def read(self, *args):
+        return self._buffer.read(*args)
+
+    def close(self):
+        self._buffer.close()
+
+
+def _error(code, status, operation, message=""):
+    return ClientError(
+        {'Error': {'Code': code, 'Message': message or code}, 'ResponseMetadata': {'HTTPStatusCode': status}},
+        operation,
+    )
+
+
+def _etag(data):
+    return f'"{hashlib.md5(data).hexdigest()}"'
+
+
+class _ListObjectsPaginator:
+    def __init__(self, client):
+        self._client = client
+
+    def paginate(self, **kwargs):
+        while True:
+            page = self._client.list_objects_v2(**kwargs)
+            yield page
+            if not page['IsTruncated']:
+                return
+            kwargs['ContinuationToken'] = page['NextContinuationToken']
+
+
+class LocalS3:
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.root, '.lock'), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split('/'))
+
+    def _read(self, bucket, key, operation):
+        try:
+            with open(self._path(bucket, key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            if operation == 'HeadObject':
+                raise _error('404', 404, operation, 'Not Found')
+            raise _error('NoSuchKey', 404, operation, 'The specified key does not exist.')
+
+    def _write(self, bucket, key, data):
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file and rename so readers never see a partial object
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None, IfMatch=None, Range=None):
+        with self._locked():
+            data = self._read(Bucket, Key, 'GetObject')
+        etag = _etag(data)
+
+        if IfMatch is not None and IfMatch != etag:
+            raise _error('PreconditionFailed', 412, 'GetObject')
+        if IfNoneMatch is not None and IfNoneMatch == etag:
+            raise _error('304', 304, 'GetObject', 'Not Modified')
+
+        response = {'ETag': etag}
+
+        size = len(data)
+        if Range is not None:
+            start, end = Range.split('=', 1)[1].split('-')
+            if start == '':
+                start, end = max(0, size - int(end)), size - 1
+            else:
+                start, end = int(start), min(int(end) if end else size - 1, size - 1)
+            data = data[start:end + 1]
+            response['ContentRange'] = f'bytes {start}-{end}/{size}'
+
+        response.update({'Body': _Body(data), 'ContentLength': len(data)})
+        return response
+
+    def head_object(self, Bucket, Key):
+        with self._locked():
+            data = self._read(Bucket, Key, 'HeadObject')
+        return {'ETag': _etag(data), 'ContentLength': len(data)}
+
+    def put_object(self, Bucket, Key, Body, IfMatch=None, IfNoneMatch=None, **kwargs):
+        data = Body if isinstance(Body, bytes) else Body.encode() if isinstance(Body, str) else Body.read()
+
+        with self._locked():
+            exists = os.path.exists(self._path(Bucket, Key))
+            if IfNoneMatch == '*' and exists:
+                raise _error('PreconditionFailed', 412, 'PutObject')
+            if IfMatch is not None:
+                if not exists:
+                    raise _error('NoSuchKey', 404, 'PutObject')
+                if _etag(self._read(Bucket, Key, 'PutObject')) != IfMatch:
+                    raise _error('PreconditionFailed', 412, 'PutObject')
+
+            self._write(Bucket, Key, data)
+
+        return {'ETag': _etag(data)}
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        with self._locked():
+            data = self._read(CopySource['Bucket'], CopySource['Key'], 'CopyObject')
+            self._write(Bucket, Key, data)
+        return {'CopyObjectResult': {'ETag': _etag(data)}}
+
+    def delete_object(self, Bucket, Key):
+        with self._locked():
+            try:
+                os.remove(self._path(Bucket, Key))
+            except FileNotFoundError:
+                pass
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix='', MaxKeys=1000, ContinuationToken=None, StartAfter='', **kwargs):
+        bucket_root = os.path.join(self.root, Bucket)
+
+        contents = []
+        with self._locked():
+            for dirpath, _, filenames in os.walk(bucket_root):
+                for filename in filenames:
+                    if filename.endswith('.tmp'):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    key = os.path.relpath(path, bucket_root).replace(os.sep, '/')
+                    if key.startswith(Prefix):
+                        stat = os.stat(path)
+                        contents.append({
+                            'Key': key,
+                            'Size': stat.st_size,
+                            'LastModified': datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+                        })
+
+        # The continuation token is the last key of the previous page
+        after = ContinuationToken or StartAfter
+        contents = sorted((obj for obj in contents if obj['Key'] > after), key=lambda obj: obj['Key'])
+
+        page = {'Contents': contents[:MaxKeys], 'KeyCount': len(contents[:MaxKeys]), 'MaxKeys': MaxKeys, 'IsTruncated': len(contents) > MaxKeys}
+        if page['IsTruncated']:
+            page['NextContinuationToken'] = contents[MaxKeys - 1]['Key']
+        return page
+
+    def get_paginator(self, operation_name):
+        if operation_name != 'list_objects_v2':
+            raise OperationNotPageableError(operation_name=operation_name)
+        return _ListObjectsPaginator(self)
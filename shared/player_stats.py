@@ -0,0 +1,106 @@
+import threading
+from typing import NamedTuple
+
+import pandas as pd
+
+from points import load_points
+
+
+# Per-game stat lines for every Stevenson player, computed for the whole
+# roster at once from the fact tables (see fact_tables.py) and cached per
+# data version. A player is identified by (Team, JerseyNumber), so looking
+# up another player is a dictionary lookup, and the season totals double as
+# leaderboards. Goals and assists come from the points engine (points.py).
+
+PLAYER_KEY = ['Team', 'JerseyNumber']
+LINE_KEY = PLAYER_KEY + ['GameID', 'GameDate', 'Opponent']
+STAT_COLUMNS = ['TotalScores', 'TotalAssistants', 'Points', 'TotalShots', 'TotalPenalties', 'FaceoffWins', 'FaceoffLosses']
+
+
+class PlayerStats(NamedTuple):
+    lines: pd.DataFrame  # one row per player per game: LINE_KEY + STAT_COLUMNS + ShootingPct
+    totals: pd.DataFrame  # one row per player: PLAYER_KEY + STAT_COLUMNS + ShootingPct
+    by_player: dict  # {(team, jersey_number): that player's rows of lines, newest game first}
+    version: str = ""
+
+
+# Rows of df as (LINE_KEY, Stat, Value) events, taking the player's jersey
+# from jersey_column and the value from value_column (1 per row if None)
+def _events(df, jersey_column, stat, value_column=None):
+    if df.empty:
+        return pd.DataFrame(columns=LINE_KEY + ['Stat', 'Value'])
+
+    events = df[['Team', 'GameID', 'GameDate', 'Opponent']].assign(
+        JerseyNumber=pd.to_numeric(df[jersey_column], errors='coerce'),
+        Stat=stat,
+        Value=1 if value_column is None else pd.to_numeric(df[value_column], errors='coerce').fillna(0),
+    )
+    return events.dropna(subset=['JerseyNumber', 'GameID'])
+
+
+def _shooting_pct(df):
+    return (df['TotalScores'] / df['TotalShots'] * 100).where(df['TotalShots'] > 0, 0.0).round(1)
+
+
+def build_player_stats(facts, points):
+    stevenson_shots = facts.shots[facts.shots['ShootingTeam'] == 'Stevenson'] if not facts.shots.empty else facts.shots
+    stevenson_penalties = facts.penalties[facts.penalties['PenaltyTeam'] == 'Stevenson'] if not facts.penalties.empty else facts.penalties
+
+    events = pd.concat([
+        _events(points.lines, 'JerseyNumber', 'TotalScores', 'Goals'),
+        _events(points.lines, 'JerseyNumber', 'TotalAssistants', 'Assists'),
+        _events(points.lines, 'JerseyNumber', 'Points', 'Points'),
+        _events(stevenson_shots, 'JerseyNumber', 'TotalShots'),
+        _events(stevenson_penalties, 'JerseyNumber', 'TotalPenalties'),
+        _events(facts.faceoff, 'JerseyNumber', 'FaceoffWins', 'Win'),
+        _events(facts.faceoff, 'JerseyNumber', 'FaceoffLosses', 'Lose'),
+    ], ignore_index=True)
+
+    if events.empty:
+        lines = pd.DataFrame(columns=LINE_KEY + STAT_COLUMNS)
+    else:
+        events['JerseyNumber'] = events['JerseyNumber'].astype('int64')
+        events['GameID'] = events['GameID'].astype('int64')
+        events['Value'] = events['Value'].astype(float)
+
+        # One pivot sums every stat of every player in every game
+        lines = events.pivot_table(index=LINE_KEY, columns='Stat', values='Value', aggfunc='sum', fill_value=0)
+        lines = lines.reindex(columns=STAT_COLUMNS, fill_value=0).astype('int64').reset_index()
+        lines.columns.name = None
+
+    lines['ShootingPct'] = _shooting_pct(lines)
+    lines = lines.sort_values(['GameDate', 'GameID'], ascending=False, ignore_index=True)
+
+    totals = lines.groupby(PLAYER_KEY, as_index=False, observed=True)[STAT_COLUMNS].sum()
+    totals['ShootingPct'] = _shooting_pct(totals)
+
+    by_player = {(team, jersey_number): rows for (team, jersey_number), rows in lines.groupby(PLAYER_KEY, sort=False, observed=True)}
+
+    return PlayerStats(lines, totals, by_player, facts.version)
+
+
+# Stat lines for one player, newest game first; empty if they have none
+def player_lines(stats, team, jersey_number):
+    rows = stats.by_player.get((team, jersey_number))
+    return rows if rows is not None else stats.lines.iloc[0:0]
+
+
+# Latest player stats per process, shared by every session; not to be mutated
+_stats_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load_player_stats(facts):
+    cached = _stats_cache.get('latest')
+    if cached is not None and cached.version == facts.version:
+        return cached
+
+    with _cache_lock:
+        cached = _stats_cache.get('latest')
+        if cached is not None and cached.version == facts.version:
+            return cached
+
+        stats = build_player_stats(facts, load_points(facts))
+        _stats_cache['latest'] = stats
+
+    return stats
@@ -0,0 +1,86 @@
+import threading
+from typing import NamedTuple
+
+import pandas as pd
+
+
+# Goals, assists and points of every Stevenson player in every game. Each
+# Stevenson goal row is melted into one record per credited player (the
+# scorer and up to two assisters), so a goal and its assists are counted in
+# one pass instead of slicing Assistant_1 and Assistant_2 into separate
+# frames. Built once per data version from the fact tables (see
+# fact_tables.py) and used by both the Team and the Player views.
+
+PLAYER_KEY = ['Team', 'JerseyNumber']
+GAME_COLUMNS = ['GameID', 'GameDate', 'Opponent']
+POINT_COLUMNS = ['Goals', 'PrimaryAssists', 'SecondaryAssists', 'Assists', 'Points']
+
+# Scoring column naming the player -> what they are credited with
+ROLES = {'Goal': 'Goals', 'Assistant_1': 'PrimaryAssists', 'Assistant_2': 'SecondaryAssists'}
+
+
+class Points(NamedTuple):
+    lines: pd.DataFrame  # one row per player per game: PLAYER_KEY + GAME_COLUMNS + POINT_COLUMNS
+    version: str = ""
+
+
+def build_points(facts):
+    empty = Points(pd.DataFrame(columns=PLAYER_KEY + GAME_COLUMNS + POINT_COLUMNS), facts.version)
+
+    scoring = facts.scoring
+    roles = [role for role in ROLES if role in scoring.columns]
+    if scoring.empty or not roles:
+        return empty
+
+    goals = scoring.loc[scoring['ScoringTeam'] == 'Stevenson', ['Team'] + GAME_COLUMNS + roles]
+    credits = goals.melt(id_vars=['Team'] + GAME_COLUMNS, value_vars=roles, var_name='Role', value_name='JerseyNumber')
+    credits = credits.assign(JerseyNumber=pd.to_numeric(credits['JerseyNumber'], errors='coerce'))
+    credits = credits.dropna(subset=['JerseyNumber', 'GameID'])
+    if credits.empty:
+        return empty
+
+    credits = credits.astype({'JerseyNumber': 'int64', 'GameID': 'int64'})
+
+    lines = pd.crosstab(
+        [credits[column] for column in PLAYER_KEY + GAME_COLUMNS],
+        credits['Role'].map(ROLES),
+    )
+    lines = lines.reindex(columns=list(ROLES.values()), fill_value=0).reset_index()
+    lines.columns.name = None
+
+    lines['Assists'] = lines['PrimaryAssists'] + lines['SecondaryAssists']
+    lines['Points'] = lines['Goals'] + lines['Assists']
+
+    return Points(lines, facts.version)
+
+
+# Points per player for a team, summed over every opponent unless one is
+# given, most points first
+def team_points(points, team, opponent="All"):
+    lines = points.lines[points.lines['Team'] == team]
+    if opponent != "All":
+        lines = lines[lines['Opponent'] == opponent]
+
+    totals = lines.groupby(PLAYER_KEY, as_index=False, observed=True)[POINT_COLUMNS].sum()
+    return totals.sort_values(['Points', 'Goals'], ascending=False, ignore_index=True)
+
+
+# Latest points per process, shared by every session; not to be mutated
+_points_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load_points(facts):
+    cached = _points_cache.get('latest')
+    if cached is not None and cached.version == facts.version:
+        return cached
+
+    with _cache_lock:
+        cached = _points_cache.get('latest')
+        if cached is not None and cached.version == facts.version:
+            return cached
+
+        points = build_points(facts)
+        _points_cache['latest'] = points
+
+    return points
@@ -0,0 +1,79 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+# The Roster as a lookup table: every (Team, JerseyNumber) gets a PlayerID,
+# its row in the player arrays, stored in a team x jersey array. Adding
+# names and positions to event rows is then two array lookups and a take,
+# instead of a full pd.merge against the roster for every table.
+#
+# A PlayerID is made from the key itself, team code * JERSEY_SLOTS + jersey,
+# where teams are numbered in the order they first appear in the Roster.
+# Adding or removing a player never renumbers anyone else; only removing
+# every player of a team, or reordering the sheet, renumbers later teams.
+# Jerseys are 0-99, so larger numbers are not looked up.
+
+KEY_COLUMNS = ['Team', 'JerseyNumber']
+PLAYER_COLUMNS = ['FirstName', 'LastName', 'Position']
+
+JERSEY_SLOTS = 100
+
+
+class RosterIndex(NamedTuple):
+    teams: pd.Index  # team names; a team's position is its row in ids
+    ids: np.ndarray  # ids[team, jersey] = PlayerID, or -1
+    players: dict  # {column: array indexed by PlayerID, NA where there is none} for KEY_COLUMNS + PLAYER_COLUMNS
+
+
+def _jerseys(jerseys):
+    return pd.to_numeric(pd.Series(jerseys), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+
+def build_roster_index(roster_df):
+    jerseys = _jerseys(roster_df['JerseyNumber'])
+    valid = roster_df['Team'].notna().to_numpy() & (jerseys >= 0) & (jerseys < JERSEY_SLOTS) & (jerseys == np.floor(jerseys))
+    roster = roster_df[valid].assign(JerseyNumber=jerseys[valid].astype('int64'))
+    roster = roster.drop_duplicates(KEY_COLUMNS, ignore_index=True)
+
+    teams = pd.Index(roster['Team'].drop_duplicates().astype(object))
+    player_id = teams.get_indexer(roster['Team']) * JERSEY_SLOTS + roster['JerseyNumber'].to_numpy()
+
+    ids = np.full((len(teams), JERSEY_SLOTS), -1, dtype=np.intp)
+    ids.flat[player_id] = player_id
+
+    # Row of the roster holding each PlayerID, -1 for the IDs nobody has
+    rows = np.full(ids.size, -1, dtype=np.intp)
+    rows[player_id] = np.arange(len(roster))
+    players = {
+        column: roster[column].array.take(rows, allow_fill=True)
+        for column in KEY_COLUMNS + PLAYER_COLUMNS if column in roster.columns
+    }
+    return RosterIndex(teams, ids, players)
+
+
+# PlayerID of every (team, jersey) pair, -1 where the roster has no such player
+def player_ids(index, teams, jerseys):
+    team_codes = index.teams.get_indexer(teams)
+    jerseys = _jerseys(jerseys)
+
+    found = (team_codes >= 0) & (jerseys >= 0) & (jerseys < index.ids.shape[1]) & (jerseys == np.floor(jerseys))
+    ids = np.full(len(team_codes), -1, dtype=np.intp)
+    ids[found] = index.ids[team_codes[found], jerseys[found].astype(np.intp)]
+    return ids
+
+
+# The roster columns for the given PlayerIDs, NaN where the ID is -1
+def roster_values(index, ids, column):
+    return index.players[column].take(ids, allow_fill=True)
+
+
+# df with the roster columns of the player in (Team, jersey_column) added,
+# like pd.merge(df, roster, how='left'); how='inner' drops rows whose player
+# is not on the roster
+def with_roster(df, index, jersey_column='JerseyNumber', columns=PLAYER_COLUMNS, how='left'):
+    ids = player_ids(index, df['Team'], df[jersey_column])
+    if how == 'inner':
+        df, ids = df[ids >= 0], ids[ids >= 0]
+    return df.assign(**{column: roster_values(index, ids, column) for column in columns})
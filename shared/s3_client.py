@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+
+import boto3
+from botocore.config import Config
+
+
+# One S3 client per process, shared by every Streamlit session and by both
+# the read path (stats.py) and the write path (shots.py). boto3 clients are
+# thread-safe, and keeping a single one alive means its urllib3 pool keeps
+# TLS connections open between reruns instead of handshaking on each one.
+#
+# Set HOCKEY_LOCAL_S3 to a directory to use LocalS3 instead of AWS, e.g. to
+# try the apps or run concurrent savers and compactions without an account.
+LOCAL_S3_ENV = 'HOCKEY_LOCAL_S3'
+
+# Concurrent requests per process: the journals' drain threads upload
+# batches while other sessions read tables
+MAX_POOL_CONNECTIONS = 20
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 20
+
+S3_CONFIG = Config(
+    max_pool_connections=MAX_POOL_CONNECTIONS,
+    tcp_keepalive=True,
+    connect_timeout=CONNECT_TIMEOUT,
+    read_timeout=READ_TIMEOUT,
+    retries={'max_attempts': 4, 'mode': 'standard'},
+)
+
+_client = None
+_client_lock = threading.Lock()
+
+# {operation: [calls, errors, total seconds, max seconds]}
+_latency = {}
+_latency_lock = threading.Lock()
+
+
+# botocore sends before-call and after-call with the operation's model, but
+# after-call-error (timeouts, no connection) only with the request context,
+# so the operation name is kept in the context when the call starts
+def _start_timer(context, model=None, **kwargs):
+    context['hockey_start'] = time.perf_counter()
+    if model is not None:
+        context['hockey_operation'] = model.name
+
+
+def _record_latency(context, model=None, exception=None, http_response=None, **kwargs):
+    start = context.pop('hockey_start', None)
+    operation = context.pop('hockey_operation', None)
+    if start is None:
+        return
+
+    if model is not None:
+        operation = model.name
+    elif operation is None:
+        # after-call-error.s3.<Operation>
+        operation = kwargs.get('event_name', '').rsplit('.', 1)[-1] or 'unknown'
+
+    elapsed = time.perf_counter() - start
+    failed = exception is not None or (http_response is not None and http_response.status_code >= 500)
+
+    with _latency_lock:
+        stats = _latency.setdefault(operation, [0, 0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += failed
+        stats[2] += elapsed
+        stats[3] = max(stats[3], elapsed)
+
+
+def _create_client(aws_access_key, aws_secret_key):
+    local_root = os.environ.get(LOCAL_S3_ENV)
+    if local_root:
+        from local_s3 import LocalS3
+        return LocalS3(local_root)
+
+    client = boto3.client(
+        's3', aws_access_key_id=aws_access_key, aws_secret_access_key=aws_secret_key, config=S3_CONFIG
+    )
+
+    # Time every API call, including botocore's own retries
+    client.meta.events.register('before-call.s3', _start_timer)
+    client.meta.events.register('after-call.s3', _record_latency)
+    client.meta.events.register('after-call-error.s3', _record_latency)
+
+    return client
+
+
+# The process-wide S3 client; the credentials of the first caller are used
+def get_s3_client(aws_access_key=None, aws_secret_key=None):
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_client(aws_access_key, aws_secret_key)
+
+    return _client
+
+
+# Connection reuse per host from the client's urllib3 pools: requests sent
+# and connections opened. requests / connections is the reuse ratio.
+def _connection_stats(client):
+    http_session = getattr(getattr(client, '_endpoint', None), 'http_session', None)
+    managers = [getattr(http_session, '_manager', None)] + list(getattr(http_session, '_proxy_managers', {}).values())
+
+    connections = {}
+    for manager in managers:
+        if manager is None:
+            continue
+        for pool_key in manager.pools.keys():
+            pool = manager.pools[pool_key]
+            host = connections.setdefault(pool.host, {'connections': 0, 'requests': 0})
+            host['connections'] += pool.num_connections
+            host['requests'] += pool.num_requests
+
+    return connections
+
+
+# Counters for the shared client: per-operation latency and per-host
+# connection reuse since the process started
+def s3_client_stats():
+    with _latency_lock:
+        latency = {
+            operation: {
+                'calls': calls,
+                'errors': errors,
+                'mean_ms': round(1000 * total / calls, 1),
+                'max_ms': round(1000 * slowest, 1),
+            }
+            for operation, (calls, errors, total, slowest) in sorted(_latency.items())
+        }
+
+    connections = _connection_stats(_client) if _client is not None else {}
+    return {'latency': latency, 'connections': connections}
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+
+# Column types of every sheet. Sheets are read from the workbook, Parquet
+# tables and CSV event batches, which all come back with strings, floats
+# for ints with blanks and 'Yes'/'No' flags; apply_schema gives every
+# loader the same types:
+#
+#   - category for the short strings repeated on every row (teams, zones,
+#     penalty codes, positions) and for periods, which are '1'-'3' but also
+#     'Overtime' and 'Shootout'; whole numbers become their digits, so the
+#     workbook's 1 and a saved '1' are the same period
+#   - category of 'Yes'/'No'/'Tie' for a game's result
+#   - nullable Int64 for jerseys, scores and counts
+#   - nullable boolean for the Yes/No flags
+#   - datetime64 for GameDate
+#
+# Tables are written back with these types (compaction), so a type may only
+# drop a value that is not valid data at all: blank or garbled numbers and
+# flags. Columns a sheet does not list (names, clock times) are left as
+# they are.
+CATEGORY = 'category'
+RESULT = 'result'
+INTEGER = 'Int64'
+BOOLEAN = 'boolean'
+DATETIME = 'datetime64[ns]'
+
+GAME_COLUMNS = {'GameDate': DATETIME, 'Team': CATEGORY, 'Opponent': CATEGORY, 'Period': CATEGORY}
+
+SCHEMAS = {
+    "Roster": {
+        'Team': CATEGORY,
+        'Position': CATEGORY,
+        'JerseyNumber': INTEGER,
+    },
+    "Scoring": {
+        **GAME_COLUMNS,
+        'Home': BOOLEAN,
+        'Win': RESULT,
+        'ScoreStevenson': INTEGER,
+        'ScoreOpponent': INTEGER,
+        'ScoringTeam': CATEGORY,
+        'IsPowerplay': BOOLEAN,
+        'Goal': INTEGER,
+        'Assistant_1': INTEGER,
+        'Assistant_2': INTEGER,
+        'GOALIE': INTEGER,
+    },
+    "Penalties": {
+        **GAME_COLUMNS,
+        'PenaltyTeam': CATEGORY,
+        'JerseyNumber': INTEGER,
+        'PenaltyMins': INTEGER,
+        'PenaltyCode': CATEGORY,
+    },
+    "Shots": {
+        **GAME_COLUMNS,
+        'IsPowerplay': BOOLEAN,
+        'IsGoal': BOOLEAN,
+        'JerseyNumber': INTEGER,
+        'ShootingTeam': CATEGORY,
+        'ShootZone': CATEGORY,
+    },
+    "Faceoff": {
+        **GAME_COLUMNS,
+        'JerseyNumber': INTEGER,
+        'Win': INTEGER,  # faceoffs won, not a flag
+        'Lose': INTEGER,
+    },
+    "Goalie": {
+        **GAME_COLUMNS,
+        'JerseyNumber': INTEGER,
+    },
+}
+
+_TRUE = {'yes', 'y', 'true', '1'}
+_FALSE = {'no', 'n', 'false', '0'}
+
+
+# 'Yes'/'No' (any case), True/False or 1/0 as a nullable boolean; anything
+# else is NA
+def to_boolean(series):
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype(BOOLEAN)
+
+    text = series.astype(object).map(lambda value: str(value).strip().lower() if pd.notna(value) else None)
+    flags = pd.Series(pd.NA, index=series.index, dtype=BOOLEAN)
+    flags[text.isin(_TRUE).to_numpy()] = True
+    flags[text.isin(_FALSE).to_numpy()] = False
+    return flags
+
+
+def _label(value):
+    if isinstance(value, (float, np.floating)) and value == np.floor(value):
+        return str(int(value))
+    return str(value)
+
+
+def _to_category(series):
+    if pd.api.types.infer_dtype(series, skipna=True) != 'string':
+        series = series.astype(object).map(lambda value: _label(value) if pd.notna(value) else None)
+    return series.astype(CATEGORY)
+
+
+# A game's result as 'Yes'/'No'/'Tie'; True/False and the other spellings
+# to_boolean accepts count as Yes/No, and any other value is kept as it is
+def to_result(series):
+    def result(value):
+        if pd.isna(value):
+            return None
+        text = str(value).strip().lower()
+        return 'Yes' if text in _TRUE else 'No' if text in _FALSE else 'Tie' if text == 'tie' else _label(value)
+
+    if isinstance(series.dtype, pd.CategoricalDtype) and set(series.cat.categories) <= {'Yes', 'No', 'Tie'}:
+        return series
+    return series.astype(object).map(result).astype(CATEGORY)
+
+
+def _to_integer(series):
+    numbers = pd.to_numeric(series, errors='coerce')
+    if pd.api.types.is_float_dtype(numbers):
+        numbers = numbers.where(numbers == np.floor(numbers))
+    return numbers.astype(INTEGER)
+
+
+def _convert(series, dtype):
+    if series.dtype == dtype:
+        return series
+    if dtype == CATEGORY:
+        return _to_category(series)
+    if dtype == RESULT:
+        return to_result(series)
+    if dtype == INTEGER:
+        return _to_integer(series)
+    if dtype == BOOLEAN:
+        return to_boolean(series)
+    if dtype == DATETIME:
+        return pd.to_datetime(series, errors='coerce', format='mixed').astype(DATETIME)
+    return series.astype(dtype)
+
+
+# df with the columns of sheet_name converted to their declared types
+def apply_schema(sheet_name, df):
+    schema = SCHEMAS.get(sheet_name, {})
+    columns = {column: _convert(df[column], dtype) for column, dtype in schema.items() if column in df.columns}
+    return df.assign(**columns) if columns else df
@@ -0,0 +1,293 @@
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+import pandas as pd
+from botocore.exceptions import ClientError
+
+from hockey_data import (
+    MAX_WRITE_ATTEMPTS,
+    SHEET_NAMES,
+    HockeyData,
+    WriteConflictError,
+    backoff,
+    conditional_put,
+    is_missing_error,
+    is_not_modified_error,
+    load_hockey_data,
+    normalize_frame,
+)
+from schema import apply_schema
+from xlsx_range import read_sheet_from_s3
+
+
+# Each logical table (one per workbook sheet) is stored as its own Parquet
+# object, tables/<Table>/<version>.parquet. tables/manifest.json maps every
+# table to its current object and lists the event batches folded into it.
+# Table objects are never modified: a new version is written and the
+# manifest is swapped to it with a conditional write, so a reader always
+# sees a consistent set of tables and only downloads the tables it needs.
+TABLES_PREFIX = 'tables'
+TABLE_MANIFEST_KEY = f'{TABLES_PREFIX}/manifest.json'
+
+# Every table entry maps the batches folded into it to when they were
+# folded, {batch_key: 'YYYY-MM-DDTHH:MM:SS+00:00'}. The keys stop a batch
+# from being folded twice while it is still pending (archiving follows the
+# fold, and a retried save may race a compaction), so once a batch has been
+# archived for this long its key is dropped rather than rewritten with
+# every manifest forever.
+COMPACTED_RETENTION = timedelta(days=7)
+
+
+# {batch_key: folded at} of a manifest entry. Entries written before the
+# fold times were kept list the keys only; they count as folded at default.
+def compacted_batches(entry, default):
+    compacted = entry.get('compacted_batches', {})
+    if isinstance(compacted, list):
+        return dict.fromkeys(compacted, default)
+    return dict(compacted)
+
+
+# Fetch the manifest. Returns (None, None) when the workbook has not been
+# migrated yet, and raises the 304 ClientError when if_none_match matches.
+def read_manifest(s3, bucket, if_none_match=None):
+    try:
+        if if_none_match is None:
+            obj = s3.get_object(Bucket=bucket, Key=TABLE_MANIFEST_KEY)
+        else:
+            obj = s3.get_object(Bucket=bucket, Key=TABLE_MANIFEST_KEY, IfNoneMatch=if_none_match)
+    except ClientError as e:
+        if is_missing_error(e):
+            return None, None
+        raise
+    return json.loads(obj['Body'].read()), obj['ETag']
+
+
+# Swap in a new manifest if nobody else has changed it since expected_etag
+def write_manifest(s3, bucket, manifest, expected_etag):
+    return conditional_put(s3, bucket, TABLE_MANIFEST_KEY, json.dumps(manifest, indent=1).encode(), expected_etag)
+
+
+# Write a new immutable version of a table and return its key
+def write_table(s3, bucket, table_name, df):
+    version = f"{datetime.now(timezone.utc).strftime('%Y-%m-%d_%H-%M-%S-%f')}_{uuid.uuid4().hex[:8]}"
+    key = f"{TABLES_PREFIX}/{table_name}/{version}.parquet"
+
+    buffer = BytesIO()
+    normalize_frame(df).to_parquet(buffer, index=False)
+    s3.put_object(Bucket=bucket, Key=key, Body=buffer.getvalue())
+
+    return key
+
+
+def read_table(s3, bucket, key):
+    obj = s3.get_object(Bucket=bucket, Key=key)
+    return apply_schema(key.split('/')[-2], pd.read_parquet(BytesIO(obj['Body'].read())))
+
+
+# Append event batches to their tables: write a new version of every table
+# containing the rows of its batches not folded in yet, then swap all of
+# them into the manifest with one conditional write, so the sheets of a
+# Save All batch become part of the tables together. batches_by_table is
+# {table_name: [batch_key]}, and read_batch(table_name, batch_key) returns
+# the rows a batch holds for a table as a DataFrame. Returns the number of
+# batches that were added to tables.
+def fold_batches_into_tables(s3, bucket, batches_by_table, read_batch):
+    now = datetime.now(timezone.utc)
+    folded_at = now.isoformat(timespec='seconds')
+    batch_frames = {}
+    built = {}  # table_name -> (base key, batches, new key) of the version written so far
+
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        manifest, manifest_etag = read_manifest(s3, bucket)
+        if manifest is None:
+            raise RuntimeError(f"{TABLE_MANIFEST_KEY} not found; run migrate_workbook.py first")
+
+        updates = {}  # table_name -> (previous entry, batches folded in now)
+        for table_name, batch_keys in batches_by_table.items():
+            entry = manifest['tables'].get(table_name, {})
+            compacted = compacted_batches(entry, folded_at)
+            new_batches = [batch_key for batch_key in batch_keys if batch_key not in compacted]
+            if not new_batches:
+                continue
+
+            # Only rebuild a table if it changed since the last attempt; a
+            # conflict caused by another table's update just needs a new manifest
+            if table_name not in built or built[table_name][:2] != (entry.get('key'), new_batches):
+                if table_name in built:
+                    s3.delete_object(Bucket=bucket, Key=built[table_name][2])
+
+                frames = [read_table(s3, bucket, entry['key'])] if entry.get('key') else []
+                for batch_key in new_batches:
+                    if (table_name, batch_key) not in batch_frames:
+                        batch_frames[table_name, batch_key] = read_batch(table_name, batch_key)
+                    frames.append(batch_frames[table_name, batch_key])
+                frames = [df for df in frames if not df.empty]
+                df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+                built[table_name] = (entry.get('key'), new_batches, write_table(s3, bucket, table_name, df))
+
+            updates[table_name] = (entry, new_batches)
+            # Keys of batches still listed as pending are kept whatever their age
+            listed = set(batch_keys)
+            kept = {
+                batch_key: when for batch_key, when in compacted.items()
+                if batch_key in listed or datetime.fromisoformat(when) >= now - COMPACTED_RETENTION
+            }
+            manifest['tables'][table_name] = {
+                'key': built[table_name][2],
+                'compacted_batches': dict(sorted({**kept, **dict.fromkeys(new_batches, folded_at)}.items())),
+            }
+
+        if not updates:
+            break
+
+        if write_manifest(s3, bucket, manifest, manifest_etag):
+            # Readers still holding the old manifest retry when its table is gone
+            for table_name, (entry, _) in updates.items():
+                if entry.get('key'):
+                    s3.delete_object(Bucket=bucket, Key=entry['key'])
+            for table_name in set(built) - set(updates):
+                s3.delete_object(Bucket=bucket, Key=built[table_name][2])
+            return len({batch_key for _, new_batches in updates.values() for batch_key in new_batches})
+
+        backoff(attempt)
+    else:
+        raise WriteConflictError(f"Could not update {TABLE_MANIFEST_KEY} after {MAX_WRITE_ATTEMPTS} attempts")
+
+    for _, _, key in built.values():
+        s3.delete_object(Bucket=bucket, Key=key)
+    return 0
+
+
+# Process-wide caches shared by every Streamlit session. Table objects are
+# immutable, so each version is downloaded once; the manifest is revalidated
+# with a conditional GET on every call. Cached DataFrames must not be mutated.
+_manifest_cache = {}
+_table_cache = {}
+_data_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _current_manifest(s3, bucket, revalidate=True):
+    cached = _manifest_cache.get(bucket)
+    if cached is not None and not revalidate:
+        return cached
+
+    try:
+        manifest, etag = read_manifest(s3, bucket, if_none_match=cached[1] if cached else None)
+    except ClientError as e:
+        if cached is not None and is_not_modified_error(e):
+            return cached
+        raise
+
+    _manifest_cache[bucket] = (manifest, etag)
+    return manifest, etag
+
+
+def _cached_table(s3, bucket, key):
+    df = _table_cache.get(key)
+    if df is None:
+        df = read_table(s3, bucket, key)
+        _table_cache[key] = df
+    return df
+
+
+def _load_tables(s3, bucket, manifest, table_names):
+    tables = manifest['tables']
+    return {
+        table_name: _cached_table(s3, bucket, tables[table_name]['key']) if table_name in tables else pd.DataFrame()
+        for table_name in table_names
+    }
+
+
+# Run load(manifest, etag) against the current manifest, starting over once
+# if a compaction removed a table version between reading the manifest and
+# downloading the table
+def _with_current_manifest(s3, bucket, load):
+    manifest, etag = _current_manifest(s3, bucket)
+    if manifest is None:
+        return None
+
+    try:
+        return load(manifest, etag)
+    except ClientError as e:
+        if not is_missing_error(e):
+            raise
+        _manifest_cache.pop(bucket, None)
+        manifest, etag = _current_manifest(s3, bucket)
+        return load(manifest, etag)
+
+
+# Workbook fallback for buckets that have not been migrated yet: revalidate
+# with a HEAD on the workbook ETag and re-parse only after it changes
+def _load_workbook_cached(s3, bucket, file_key):
+    workbook_etag = s3.head_object(Bucket=bucket, Key=file_key)['ETag']
+
+    cached = _data_cache.get((bucket, file_key))
+    if cached is not None and cached.version == workbook_etag:
+        return cached
+
+    with _cache_lock:
+        cached = _data_cache.get((bucket, file_key))
+        if cached is not None and cached.version == workbook_etag:
+            return cached
+
+        data = load_hockey_data(s3, bucket, file_key)
+        _data_cache[(bucket, file_key)] = data
+
+    return data
+
+
+# Workbook fallback for a single sheet: fetch only that sheet's parts of
+# the .xlsx with Range GETs, and re-read it only after the ETag changes
+def _load_workbook_sheet_cached(s3, bucket, file_key, sheet_name):
+    workbook_etag = s3.head_object(Bucket=bucket, Key=file_key)['ETag']
+
+    cached = _data_cache.get((bucket, file_key, sheet_name))
+    if cached is not None and cached[0] == workbook_etag:
+        return cached[1]
+
+    df, workbook_etag = read_sheet_from_s3(s3, bucket, file_key, sheet_name)
+    df = apply_schema(sheet_name, df) if df is not None else pd.DataFrame()
+    _data_cache[(bucket, file_key, sheet_name)] = (workbook_etag, df)
+
+    return df
+
+
+# Load a single table, e.g. the Roster for the data entry app
+def load_table_cached(s3, bucket, file_key, table_name):
+    df = _with_current_manifest(s3, bucket, lambda manifest, etag: _load_tables(s3, bucket, manifest, [table_name])[table_name])
+    if df is None:
+        df = _load_workbook_sheet_cached(s3, bucket, file_key, table_name)
+    return df
+
+
+# Load every table as a HockeyData bundle whose version is the manifest ETag
+def load_hockey_data_cached(s3, bucket, file_key):
+    def load(manifest, etag):
+        cached = _data_cache.get(bucket)
+        if cached is not None and cached.version == etag:
+            return cached
+
+        with _cache_lock:
+            tables = _load_tables(s3, bucket, manifest, SHEET_NAMES)
+            compacted_batches = frozenset(
+                batch_key for entry in manifest['tables'].values() for batch_key in entry.get('compacted_batches', [])
+            )
+            data = HockeyData(*(tables[table_name] for table_name in SHEET_NAMES), version=etag, compacted_batches=compacted_batches)
+            _data_cache[bucket] = data
+
+            # Forget table versions the manifest no longer points at
+            current_keys = {entry['key'] for entry in manifest['tables'].values()}
+            for key in set(_table_cache) - current_keys:
+                del _table_cache[key]
+
+        return data
+
+    data = _with_current_manifest(s3, bucket, load)
+    if data is None:
+        data = _load_workbook_cached(s3, bucket, file_key)
+    return data
@@ -0,0 +1,324 @@
+import posixpath
+import re
+import struct
+import zlib
+from datetime import datetime, timedelta
+from xml.etree.ElementTree import XMLPullParser, fromstring
+
+import pandas as pd
+from pandas.io.parsers import TextParser
+from botocore.exceptions import ClientError
+
+from hockey_data import is_conflict_error
+
+
+# Read a single worksheet out of an .xlsx in S3 without downloading the
+# whole workbook. An .xlsx is a zip archive, so we fetch the end of the
+# file to find the central directory, then use Range GETs for just the
+# parts the sheet needs (workbook.xml and its rels, styles, shared strings
+# and the worksheet itself) and stream-parse the worksheet XML as it is
+# inflated. Every Range GET after the first is pinned to the same ETag so
+# parts of different versions of the workbook are never mixed.
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# End of central directory record: 22 bytes plus a comment of up to 64KB
+EOCD_SIGNATURE = b'PK\x05\x06'
+EOCD_MAX_SIZE = 22 + 0xFFFF
+CENTRAL_DIRECTORY_SIGNATURE = b'PK\x01\x02'
+LOCAL_HEADER_SIZE = 30
+
+# Parts closer together than this are fetched with a single Range GET
+COALESCE_GAP = 64 * 1024
+
+# Built-in number formats that display dates or times
+DATE_FORMAT_IDS = set(range(14, 23)) | {45, 46, 47}
+
+
+class _ZipMember:
+    def __init__(self, name, method, compressed_size, header_offset, extra_size):
+        self.name = name
+        self.method = method
+        self.compressed_size = compressed_size
+        self.header_offset = header_offset
+        self.extra_size = extra_size
+
+    # Local header + data; the local extra field is usually the same size as
+    # the central one, and a short read is topped up in _member_bytes
+    @property
+    def span(self):
+        end = self.header_offset + LOCAL_HEADER_SIZE + len(self.name.encode()) + self.extra_size + self.compressed_size
+        return self.header_offset, end
+
+
+class _RangeReader:
+    def __init__(self, s3, bucket, key):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.etag = None
+        self.requests = 0
+
+    def get(self, start, end):
+        self.requests += 1
+        obj = self.s3.get_object(Bucket=self.bucket, Key=self.key, Range=f'bytes={start}-{end - 1}', IfMatch=self.etag)
+        return obj['Body'].read()
+
+    def tail(self, length):
+        self.requests += 1
+        obj = self.s3.get_object(Bucket=self.bucket, Key=self.key, Range=f'bytes=-{length}')
+        self.etag = obj['ETag']
+        size = int(obj['ContentRange'].rsplit('/', 1)[1])
+        return obj['Body'].read(), size
+
+
+def _read_central_directory(reader):
+    tail, size = reader.tail(EOCD_MAX_SIZE)
+    eocd = tail.rfind(EOCD_SIGNATURE)
+    if eocd < 0:
+        raise ValueError(f"{reader.key} is not a zip archive")
+
+    entries, cd_size, cd_offset = struct.unpack('<10xHII', tail[eocd:eocd + 20])
+    if cd_offset == 0xFFFFFFFF:
+        raise ValueError(f"{reader.key} is a zip64 archive, which is not supported")
+
+    tail_start = size - len(tail)
+    if cd_offset >= tail_start:
+        directory = tail[cd_offset - tail_start:cd_offset - tail_start + cd_size]
+    else:
+        directory = reader.get(cd_offset, cd_offset + cd_size)
+
+    members = {}
+    pos = 0
+    for _ in range(entries):
+        if directory[pos:pos + 4] != CENTRAL_DIRECTORY_SIGNATURE:
+            raise ValueError(f"Corrupt central directory in {reader.key}")
+        method, = struct.unpack('<H', directory[pos + 10:pos + 12])
+        compressed_size, = struct.unpack('<I', directory[pos + 20:pos + 24])
+        name_size, extra_size, comment_size = struct.unpack('<HHH', directory[pos + 28:pos + 34])
+        header_offset, = struct.unpack('<I', directory[pos + 42:pos + 46])
+        name = directory[pos + 46:pos + 46 + name_size].decode('utf-8')
+
+        members[name] = _ZipMember(name, method, compressed_size, header_offset, extra_size)
+        pos += 46 + name_size + extra_size + comment_size
+
+    return members
+
+
+# Fetch several members with as few Range GETs as possible
+def _fetch_members(reader, members):
+    fetched = {}
+    groups = []
+    for member in sorted(members, key=lambda member: member.header_offset):
+        start, end = member.span
+        if groups and start - groups[-1][1] <= COALESCE_GAP:
+            groups[-1][1] = max(groups[-1][1], end)
+            groups[-1][2].append(member)
+        else:
+            groups.append([start, end, [member]])
+
+    for start, end, group in groups:
+        data = reader.get(start, end)
+        for member in group:
+            fetched[member.name] = _member_bytes(reader, member, data, start)
+
+    return fetched
+
+
+# Slice a member's compressed data out of a fetched range
+def _member_bytes(reader, member, data, data_start):
+    pos = member.header_offset - data_start
+    name_size, extra_size = struct.unpack('<HH', data[pos + 26:pos + 30])
+    data_pos = pos + LOCAL_HEADER_SIZE + name_size + extra_size
+
+    compressed = data[data_pos:data_pos + member.compressed_size]
+    if len(compressed) < member.compressed_size:
+        missing_start = data_start + data_pos + len(compressed)
+        compressed += reader.get(missing_start, data_start + data_pos + member.compressed_size)
+
+    return compressed
+
+
+def _inflate_chunks(member, compressed, chunk_size=256 * 1024):
+    if member.method == 0:
+        yield compressed
+        return
+    if member.method != 8:
+        raise ValueError(f"Unsupported compression method {member.method} for {member.name}")
+
+    inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+    for pos in range(0, len(compressed), chunk_size):
+        yield inflater.decompress(compressed[pos:pos + chunk_size])
+    yield inflater.flush()
+
+
+def _inflate(member, compressed):
+    return b''.join(_inflate_chunks(member, compressed))
+
+
+def _parse_xml(member, compressed):
+    parser = XMLPullParser(events=('end',))
+    for chunk in _inflate_chunks(member, compressed):
+        parser.feed(chunk)
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+
+def _sheet_path(workbook_xml, rels_xml, sheet_name):
+    workbook = fromstring(workbook_xml)
+    rel_id = None
+    for sheet in workbook.iter(f'{MAIN_NS}sheet'):
+        if sheet.get('name') == sheet_name:
+            rel_id = sheet.get(f'{REL_NS}id')
+    if rel_id is None:
+        return None, False
+
+    properties = workbook.find(f'{MAIN_NS}workbookPr')
+    date1904 = properties is not None and properties.get('date1904') in ('1', 'true')
+
+    for rel in fromstring(rels_xml).iter(f'{PKG_REL_NS}Relationship'):
+        if rel.get('Id') == rel_id:
+            target = rel.get('Target')
+            path = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+            return path, date1904
+
+    return None, False
+
+
+def _shared_strings(member, compressed):
+    strings = []
+    for _, element in _parse_xml(member, compressed):
+        if element.tag == f'{MAIN_NS}si':
+            strings.append(''.join(text.text or '' for text in element.iter(f'{MAIN_NS}t')))
+            element.clear()
+    return strings
+
+
+# Indexes of cell styles (cellXfs) whose number format is a date
+def _date_styles(styles_xml):
+    styles = fromstring(styles_xml)
+    date_formats = set(DATE_FORMAT_IDS)
+    for num_fmt in styles.iter(f'{MAIN_NS}numFmt'):
+        code = re.sub(r'"[^"]*"|\[[^\]]*\]|\\.', '', num_fmt.get('formatCode', '').lower())
+        if re.search(r'[dmy]', code):
+            date_formats.add(int(num_fmt.get('numFmtId')))
+
+    cell_xfs = styles.find(f'{MAIN_NS}cellXfs')
+    if cell_xfs is None:
+        return set()
+    return {index for index, xf in enumerate(cell_xfs) if int(xf.get('numFmtId', 0)) in date_formats}
+
+
+def _column_index(reference):
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+def _cell_value(cell, strings, date_styles, epoch):
+    cell_type = cell.get('t', 'n')
+    if cell_type == 'inlineStr':
+        return ''.join(text.text or '' for text in cell.iter(f'{MAIN_NS}t'))
+
+    value = cell.find(f'{MAIN_NS}v')
+    if value is None or value.text is None:
+        return None
+    text = value.text
+
+    if cell_type == 's':
+        return strings[int(text)]
+    if cell_type == 'b':
+        return text == '1'
+    if cell_type in ('str', 'e'):
+        return text
+
+    number = float(text)
+    if int(cell.get('s', 0)) in date_styles:
+        return epoch + timedelta(days=number)
+    return int(number) if number.is_integer() else number
+
+
+# (row number, {column: value}) of every row with a value in it
+def _sheet_rows(member, compressed, strings, date_styles, epoch):
+    number = -1
+    for _, element in _parse_xml(member, compressed):
+        if element.tag != f'{MAIN_NS}row':
+            continue
+
+        number = int(element.get('r')) - 1 if element.get('r') else number + 1
+        row = {}
+        for position, cell in enumerate(element.iter(f'{MAIN_NS}c')):
+            reference = cell.get('r')
+            column = _column_index(reference) if reference else position
+            row[column] = _cell_value(cell, strings, date_styles, epoch)
+        element.clear()
+
+        if any(value is not None for value in row.values()):
+            yield number, row
+
+
+def _blank(value):
+    return '' if value is None else value
+
+
+# Read one sheet of an .xlsx stored in S3 into a DataFrame using Range GETs.
+# The first row is the header, as with pd.read_excel. Returns the frame and
+# the workbook ETag it was read from; the frame is None if the workbook has
+# no sheet with that name.
+def read_sheet_from_s3(s3, bucket, file_key, sheet_name, retries=1):
+    reader = _RangeReader(s3, bucket, file_key)
+    try:
+        return _read_sheet(reader, sheet_name), reader.etag
+    except ClientError as e:
+        # The workbook was replaced between two Range GETs
+        if is_conflict_error(e) and retries > 0:
+            return read_sheet_from_s3(s3, bucket, file_key, sheet_name, retries - 1)
+        raise
+
+
+def _read_sheet(reader, sheet_name):
+    members = _read_central_directory(reader)
+
+    parts = [members[name] for name in ('xl/workbook.xml', 'xl/_rels/workbook.xml.rels')]
+    fetched = _fetch_members(reader, parts)
+    sheet_path, date1904 = _sheet_path(
+        _inflate(members['xl/workbook.xml'], fetched['xl/workbook.xml']),
+        _inflate(members['xl/_rels/workbook.xml.rels'], fetched['xl/_rels/workbook.xml.rels']),
+        sheet_name,
+    )
+    if sheet_path is None:
+        return None
+
+    names = [sheet_path] + [name for name in ('xl/sharedStrings.xml', 'xl/styles.xml') if name in members]
+    fetched.update(_fetch_members(reader, [members[name] for name in names]))
+
+    strings = []
+    if 'xl/sharedStrings.xml' in members:
+        strings = _shared_strings(members['xl/sharedStrings.xml'], fetched['xl/sharedStrings.xml'])
+
+    date_styles = set()
+    if 'xl/styles.xml' in members:
+        date_styles = _date_styles(_inflate(members['xl/styles.xml'], fetched['xl/styles.xml']))
+
+    epoch = datetime(1904, 1, 1) if date1904 else datetime(1899, 12, 30)
+    rows = dict(_sheet_rows(members[sheet_path], fetched[sheet_path], strings, date_styles, epoch))
+    if not rows:
+        return pd.DataFrame()
+
+    # Blank rows between the header and the last row are kept, as NaN rows
+    first, last = min(rows), max(rows)
+    rows = [rows.get(number, {}) for number in range(first, last + 1)]
+
+    # Parsed by pd.read_excel's own parser, with blank cells as '' like its
+    # openpyxl reader, so blanks, booleans and numbers are typed the same way
+    # as when the whole workbook is read, and columns without a header name
+    # become 'Unnamed: n'
+    width = max(max(row) for row in rows if row) + 1
+    data = [[_blank(row.get(column)) for column in range(width)] for row in rows]
+    return TextParser(data, header=0).read()
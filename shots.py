@@ -8,10 +8,10 @@ import streamlit as st
 import pandas as pd
 
 import base64
-import boto3
-import pandas as pd
-from io import BytesIO
-from openpyxl import load_workbook
+
+from journal import FLUSH_INTERVAL, journal_backlog, open_journal
+from s3_client import get_s3_client
+from table_store import load_table_cached
 
 # Use the Access Key and Secret Key you just created
 
@@ -23,120 +23,26 @@ EXCEL_FILE_KEY = 'Stevenson_Hockey.xlsx'
 #EXCEL_FILE_KEY = 'Stevenson_Hockey_Testing.xlsx' 
 
 
-# Create an S3 client
-s3 = boto3.client('s3', aws_access_key_id=AWS_ACCESS_KEY, aws_secret_access_key=AWS_SECRET_KEY)
-
-
-
-def read_excel_from_s3(bucket, file_key, sheet_name):
-    # Get the object from S3
-    obj = s3.get_object(Bucket=bucket, Key=file_key)
-    
-    # Read the content of the file into a Pandas DataFrame
-    excel_data = obj['Body'].read()
-    df = pd.read_excel(BytesIO(excel_data), sheet_name=sheet_name)
-    
-    return df
-
+# Shared S3 client for the whole process (pooled, kept alive across reruns)
+s3 = get_s3_client(AWS_ACCESS_KEY, AWS_SECRET_KEY)
 
-roster_df = read_excel_from_s3(S3_BUCKET, EXCEL_FILE_KEY, sheet_name="Roster")
 
 
+# Only the Roster table is downloaded, once per session ("Refresh Roster"
+# in the sidebar fetches it again)
+if "roster_df" not in st.session_state:
+    st.session_state["roster_df"] = load_table_cached(s3, S3_BUCKET, EXCEL_FILE_KEY, "Roster")
+roster_df = st.session_state["roster_df"]
 
-# Read the existing Excel file from S3
-def read_excel_from_s3(bucket, file_key):
-    obj = s3.get_object(Bucket=bucket, Key=file_key)
-    return obj['Body'].read()
 
-# Append new data to the "Shots" worksheet
-import pandas as pd
-from io import BytesIO
-from openpyxl import load_workbook
 
-#def append_to_excel_s3(bucket, file_key, data_to_save, sheet_name="Shots"):
-def append_to_excel_s3(bucket, file_key, data_to_save, sheet_name):
-    # Convert the incoming data (likely a list) to a DataFrame
-    df_new = pd.DataFrame(data_to_save)
+# Rows entered in each input section. Every section is a fragment that
+# reruns on its own when its widgets change (the roster load and the other
+# sections do not rerun), so the rows are kept in the session for "Save All".
+for sheet_name in ("Scoring", "Shots", "Faceoff", "Goalie"):
+    st.session_state.setdefault(f"{sheet_name}_rows", [])
 
-    # Load the existing Excel file from S3
-    excel_data = read_excel_from_s3(bucket, file_key)
-    
-    # Open the workbook
-    with BytesIO(excel_data) as buffer:
-        workbook = load_workbook(buffer)
-        writer_buffer = BytesIO()  # Buffer for saving the updated Excel file
-
-        # Load existing data from "Shots" worksheet (if it exists)
-        if sheet_name in workbook.sheetnames:
-            sheet = workbook[sheet_name]
-            
-            # Convert existing data in "Shots" to a DataFrame
-            data = list(sheet.values)  # Convert the iterator to a list of rows
-            if len(data) > 0:
-                # The first row is treated as column names, the rest as data
-                existing_df = pd.DataFrame(data[1:], columns=data[0])
-            else:
-                existing_df = pd.DataFrame()  # No data, initialize an empty DataFrame
-        else:
-            # Create a new sheet if it does not exist
-            sheet = workbook.create_sheet(sheet_name)
-            existing_df = pd.DataFrame()  # No existing data since the sheet is new
-
-        # Ensure 'GameDate' is in both dataframes and convert to datetime
-        if 'GameDate' in df_new.columns and 'GameDate' in existing_df.columns:
-            # Convert 'GameDate' to datetime format in both DataFrames
-            df_new['GameDate'] = pd.to_datetime(df_new['GameDate'], errors='coerce').dt.strftime('%Y-%m-%d')
-            existing_df['GameDate'] = pd.to_datetime(existing_df['GameDate'], errors='coerce').dt.strftime('%Y-%m-%d')
-
-        # Ensure no index column exists in existing_df
-        if 'index' in existing_df.columns:
-            existing_df = existing_df.drop(columns=['index'])
-
-        # Ensure both DataFrames have the same columns and reset index
-        if not existing_df.empty:
-            df_new = df_new.reindex(columns=existing_df.columns)
-            existing_df.reset_index(drop=True, inplace=True)
-
-        # Check if df_new is a valid DataFrame and not empty
-        if isinstance(df_new, pd.DataFrame) and not df_new.empty:
-            # Concatenate the new data to the existing data
-            updated_df = pd.concat([existing_df, df_new], ignore_index=True)
-        else:
-            updated_df = existing_df  # If no new data, keep existing data
-
-
-            
-        #st.dataframe(existing_df, width=650)
-        #st.dataframe(df_new, width=650)
-        #st.dataframe(updated_df, width=650)              
-            
-            
-            
-        # Clear the sheet and write the updated DataFrame back to the "Shots" sheet
-        sheet.delete_rows(1, sheet.max_row)  # Clear the sheet
-
-        # Write the updated DataFrame back to the sheet, including headers
-        for r_idx, row in updated_df.iterrows():
-            for c_idx, value in enumerate(row):
-                sheet.cell(row=r_idx+2, column=c_idx+1, value=value)  # Write values starting from row 2
-        for col_idx, col_name in enumerate(updated_df.columns):
-            sheet.cell(row=1, column=col_idx+1, value=col_name)  # Write column headers
-
-        # Save the updated workbook to the in-memory buffer
-        workbook.save(writer_buffer)
-        writer_buffer.seek(0)  # Go to the start of the buffer
-
-        # Write the updated Excel file back to S3
-        s3.put_object(Bucket=bucket, Key=file_key, Body=writer_buffer.getvalue())
-
-        
-        
-        
-# Placeholder for the data to be saved
-data_to_save = []
-faceoff_to_s3 = []
-scores_to_s3 = []
-goalie_to_s3 = []
+SHOT_ZONES = ["1 - Inner Slot", "2 - West Outer Slot", "3 - East Outer Slot", "4 - Outside North West", "5 - Outside North East", "6 - West Point", "7 - Center Point","8 - East Point"]
 
 #st.set_option('deprecation.showPyplotGlobalUse', False)
 
@@ -221,16 +127,121 @@ with st.sidebar:
     # Add a radio button to select if Stevenson is home or away
     stevenson_home = st.radio("Is Stevenson the Home Team?", ("Yes", "No"))
 
+    if st.button("Refresh Roster"):
+        st.session_state["roster_df"] = load_table_cached(s3, S3_BUCKET, EXCEL_FILE_KEY, "Roster")
+        st.rerun()
+
 
 
 
 
 # Main area ###########################
 
-# Main area
+# Every save and live tap is journaled on this machine and sent to S3 in the
+# background, so entry never waits on S3 and survives losing the connection
+game_journal = open_journal(s3, S3_BUCKET, selected_team, opponent, game_date.strftime('%Y-%m-%d'))
+
+
+# Refreshes on its own while the background thread sends the journals
+@st.fragment(run_every=FLUSH_INTERVAL)
+def upload_status():
+    backlog = journal_backlog()
+    waiting_batches = sum(batches for batches, _, _ in backlog.values())
+    waiting_events = sum(events for _, events, _ in backlog.values())
+
+    cols = st.columns(3)
+    cols[0].metric("Live events recorded", len(game_journal.events))
+    cols[1].metric("Saves waiting to upload", waiting_batches)
+    cols[2].metric("Live events waiting", waiting_events)
+    for name, (batches, events, last_error) in backlog.items():
+        if last_error is not None:
+            st.warning(f"Could not upload {name} yet ({batches} saves, {events} live events), will retry: {last_error}")
+
+
+st.title("Upload Status")
+upload_status()
+
+st.markdown("<hr>", unsafe_allow_html=True)
+
+# Live play-by-play entry
+st.title("Live Game Entry")
+
+
+@st.fragment
+def live_section():
+    period_live = st.radio("Select Period", options=["1", "2", "3", "Overtime"], horizontal=True, key="period_live")
+
+    cols = st.columns(3)
+    with cols[0]:
+        live_jersey = st.selectbox("Jersey Number", unique_jersey_numbers, key="live_jersey")
+        live_jersey = int(live_jersey) if pd.notna(live_jersey) else None
+    with cols[1]:
+        live_zone = st.selectbox("Shoot Zone", SHOT_ZONES, key="live_zone")
+    with cols[2]:
+        live_penalty_code = st.text_input("Penalty Code", value="MIN", key="live_penalty_code")
+        live_penalty_mins = st.number_input("Penalty Minutes", min_value=0, max_value=10, value=2, key="live_penalty_mins")
+
+    cols = st.columns(2)
+    with cols[0]:
+        live_assistant_1 = st.selectbox("Assistant_1", unique_jersey_numbers, key="live_assistant_1")
+    with cols[1]:
+        live_assistant_2 = st.selectbox("Assistant_2", unique_jersey_numbers, key="live_assistant_2")
+
+    game = {"GameDate": game_date.strftime('%Y-%m-%d'), "Team": selected_team, "Opponent": opponent, "Period": period_live}
+
+    # Running score from the goals journaled so far; the last goal of the
+    # game carries the final score
+    goals = [row["ScoringTeam"] for _, sheet_name, row in game_journal.events if sheet_name == "Scoring"]
+
+    def record_goal(scoring_team, scorer, assistants):
+        score_stevenson = goals.count("Stevenson") + (scoring_team == "Stevenson")
+        score_opponent = len(goals) - goals.count("Stevenson") + (scoring_team != "Stevenson")
+        game_journal.append("Scoring", {
+            **game,
+            "Home": stevenson_home,
+            "Win": "Yes" if score_stevenson > score_opponent else "No" if score_stevenson < score_opponent else "Tie",
+            "ScoreStevenson": score_stevenson,
+            "ScoreOpponent": score_opponent,
+            "ScoringTeam": scoring_team,
+            "Goal": scorer,
+            "Assistant_1": assistants[0],
+            "Assistant_2": assistants[1],
+        })
+
+    cols = st.columns(4)
+    if cols[0].button("Stevenson Shot", use_container_width=True):
+        game_journal.append("Shots", {**game, "JerseyNumber": live_jersey, "ShootingTeam": "Stevenson", "ShootZone": live_zone})
+    if cols[1].button("Opponent Shot", use_container_width=True):
+        game_journal.append("Shots", {**game, "JerseyNumber": 0, "ShootingTeam": opponent, "ShootZone": live_zone})
+    if cols[2].button("Stevenson Goal", use_container_width=True):
+        assistants = [int(jersey) if pd.notna(jersey) else None for jersey in (live_assistant_1, live_assistant_2)]
+        record_goal("Stevenson", live_jersey, assistants)
+    if cols[3].button("Opponent Goal", use_container_width=True):
+        record_goal(opponent, None, [None, None])
+
+    cols = st.columns(4)
+    if cols[0].button("Stevenson Penalty", use_container_width=True):
+        game_journal.append("Penalties", {**game, "PenaltyTeam": "Stevenson", "JerseyNumber": live_jersey, "PenaltyMins": int(live_penalty_mins), "PenaltyCode": live_penalty_code})
+    if cols[1].button("Opponent Penalty", use_container_width=True):
+        game_journal.append("Penalties", {**game, "PenaltyTeam": opponent, "JerseyNumber": 0, "PenaltyMins": int(live_penalty_mins), "PenaltyCode": live_penalty_code})
+    if cols[2].button("Faceoff Won", use_container_width=True):
+        game_journal.append("Faceoff", {**game, "JerseyNumber": live_jersey, "Win": 1, "Lose": 0})
+    if cols[3].button("Faceoff Lost", use_container_width=True):
+        game_journal.append("Faceoff", {**game, "JerseyNumber": live_jersey, "Win": 0, "Lose": 1})
+
+
+with st.expander("Live Game Entry", expanded=False):
+    live_section()
+
+st.markdown("<hr>", unsafe_allow_html=True)
+
+
+
 st.title("Hockey Game Scores Input")
 
-with st.expander("Game Scores Input", expanded=False):
+@st.fragment
+def scores_section():
+    scores_to_s3 = []
 
     st.subheader(f"Final Scores")
     cols = st.columns(2)  # Now, cols[0], cols[1], and cols[2] are valid
@@ -305,6 +316,11 @@ with st.expander("Game Scores Input", expanded=False):
                 if assistant_2_jersey == 0:
                     assistant_2_jersey = None
 
+            # Roster jerseys are numpy ints; rows are saved with plain ints
+            score_jersey_number, assistant_1_jersey, assistant_2_jersey = [
+                int(jersey) if pd.notna(jersey) else None for jersey in (score_jersey_number, assistant_1_jersey, assistant_2_jersey)
+            ]
+
             # Append the data to data_to_save
             scores_to_s3.append({  
                 "GameDate": game_date.strftime('%Y-%m-%d'),
@@ -329,47 +345,22 @@ with st.expander("Game Scores Input", expanded=False):
         if not scores_to_s3:
             st.warning("No score data to save. Please add data before saving.")
         else:
-                # Check if data_to_save is not empty, and write it to storage (or process it)
-                if scores_to_s3:
-                    try:
-                        # Call the function to append data and upload back to S3
-                        append_to_excel_s3(S3_BUCKET, EXCEL_FILE_KEY, scores_to_s3, "Scoring")
-
-
-                        # Assuming df is currently a list
-                        if isinstance(scores_to_s3, list):
-                            # Case 1: List of lists
-                            if all(isinstance(i, list) for i in scores_to_s3):
-                                # Convert list of lists into DataFrame
-                                scores_to_s3 = pd.DataFrame(scores_to_s3, columns=['GameDate', 'Team', 'Opponent','Period','JerseyNumber','Assistant_1','Assistant_2'])  # Adjust column names as needed
-
-                            # Case 2: List of dictionaries
-                            elif all(isinstance(i, dict) for i in scores_to_s3):
-                                # Convert list of dictionaries into DataFrame
-                                scores_to_s3 = pd.DataFrame(scores_to_s3)
-
-
-                        #write backup file:
-                        current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                        file_name = f"temp/scores_{selected_team}_{current_time}.csv"
+            try:
+                # Journal the rows on this machine; they are uploaded as an event batch in the background
+                game_journal.save({"Scoring": scores_to_s3}, selected_team)
 
-                        # Convert DataFrame to CSV in memory
-                        csv_buffer = BytesIO()
-                        scores_to_s3.to_csv(csv_buffer, index=False)
+                # Display success message
+                st.success("Score data saved! It is uploaded in the background.")
 
-                        csv_buffer.seek(0)
+            except Exception as e:
+                # Display error message if something goes wrong
+                st.error(f"An error occurred while saving the score data: {e}")
 
-                        # Upload the CSV file to S3
-                        s3.put_object(Bucket=S3_BUCKET, Key=file_name, Body=csv_buffer.getvalue())
+    st.session_state["Scoring_rows"] = scores_to_s3
 
 
-
-                        # Display success message
-                        st.success("Score data successfully uploaded!")
-
-                    except Exception as e:
-                        # Display error message if something goes wrong
-                        st.error(f"An error occurred while uploading the sscore data: {e}")                              
+with st.expander("Game Scores Input", expanded=False):
+    scores_section()
             
             
             
@@ -382,72 +373,75 @@ st.markdown("<hr>", unsafe_allow_html=True)
 # Expander for "Hockey Game Shots Input"
 st.title("Hockey Game Shots Input")
 
-with st.expander("Game Shots Input", expanded=False):
+@st.fragment
+def shots_section():
+    data_to_save = []
+
     #st.title("Hockey Game Shots Input")
             
     # Add a radio button for selecting the period, displayed horizontally
     period = st.radio("Select Period", options=["1", "2", "3", "Overtime"], horizontal=True)
     
-    # Create two sections: Stevenson Team and Opponent Team, with a vertical line in between
-    col1, col_mid, col2 = st.columns([10, 1, 10])  # Adjust column width ratios as needed
-    
-    # Stevenson Team Section
-    with col1:
-        st.header(f"Stevenson Team - Period {period}")
-        stevenson_shots = st.slider(f"Number of Shots by Stevenson in Period {period}", min_value=0, max_value=30, value=0)
-        
-        if stevenson_shots > 0:
-            st.subheader(f"Stevenson Shots Details for Period {period}")
-            for i in range(stevenson_shots):
-                cols = st.columns([2, 2])  # Define column widths
-                with cols[0]:
-                    shoot_zone = st.selectbox(f"Shoot Zone (Shot {i+1})", 
-                                              ["1 - Inner Slot", "2 - West Outer Slot", "3 - East Outer Slot", "4 - Outside North West", "5 - Outside North East", "6 - West Point", "7 - Center Point","8 - East Point"], 
-                                              key=f"stevenson_shoot_zone_{i}")
-                with cols[1]:
-                    jersey_number = st.selectbox(f"Jersey Number (Shot {i+1})", unique_jersey_numbers, key=f"stevenson_jersey_{i}")
-                    
-                data_to_save.append({
-                    "GameDate": game_date.strftime('%Y-%m-%d'),
-                    "Team": selected_team,
-                    "Opponent": opponent,
-                    "Period": period,
-                    "JerseyNumber": jersey_number,               
-                    "ShootingTeam": "Stevenson",
-                    "ShootZone": shoot_zone
-                })
-    
-    # Vertical line separator
-    with col_mid:
-        st.markdown("##")
-        st.markdown(".")
-                
-    # Opponent Team Section
-    with col2:
-        st.header(f"Opponent Team - Period {period}")
-        opponent_shots = st.slider(f"Number of Shots by Opponent in Period {period}", min_value=0, max_value=30, value=0)
-        
-        if opponent_shots > 0:
-            st.subheader(f"Opponent Shots Details for Period {period}")
-            for i in range(opponent_shots):
-                cols = st.columns([2, 2])  # Define column widths
-                with cols[0]:
-                    shoot_zone = st.selectbox(f"Shoot Zone (Shot {i+1})", 
-                                              ["1 - Inner Slot", "2 - West Outer Slot", "3 - East Outer Slot", "4 - Outside North West", "5 - Outside North East", "6 - West Point", "7 - Center Point","8 - East Point"], 
-                                              key=f"opponent_shoot_zone_{i}")
-                with cols[1]:
-                    jersey_number = st.text_input(f"Jersey Number (Shot {i+1})", value="0", key=f"opponent_jersey_{i}")
-                    
-                data_to_save.append({
-                    "GameDate": game_date.strftime('%Y-%m-%d'),
-                    "Team": selected_team,
-                    "Opponent": opponent,
-                    "Period": period,        
-                    "JerseyNumber": jersey_number,                
-                    "ShootingTeam": opponent,
-                    "ShootZone": shoot_zone
-                })
-                
+    # One editable grid of shots per team for the period. Both grids sit in a
+    # form, so edits stay in the browser and the page reruns once when they
+    # are applied instead of on every change.
+    empty_shots = pd.DataFrame({"ShootZone": pd.Series(dtype=str), "JerseyNumber": pd.Series(dtype="Int64")})
+
+    with st.form(f"shots_form_{period}"):
+        # Create two sections: Stevenson Team and Opponent Team, with a vertical line in between
+        col1, col_mid, col2 = st.columns([10, 1, 10])  # Adjust column width ratios as needed
+
+        # Stevenson Team Section
+        with col1:
+            st.header(f"Stevenson Team - Period {period}")
+            stevenson_grid = st.data_editor(
+                empty_shots,
+                num_rows="dynamic",
+                hide_index=True,
+                use_container_width=True,
+                key=f"stevenson_shots_{period}",
+                column_config={
+                    "ShootZone": st.column_config.SelectboxColumn("Shoot Zone", options=SHOT_ZONES, default=SHOT_ZONES[0], required=True),
+                    "JerseyNumber": st.column_config.SelectboxColumn("Jersey Number", options=[int(n) for n in unique_jersey_numbers if pd.notna(n)]),
+                },
+            )
+
+        # Vertical line separator
+        with col_mid:
+            st.markdown("##")
+            st.markdown(".")
+
+        # Opponent Team Section
+        with col2:
+            st.header(f"Opponent Team - Period {period}")
+            opponent_grid = st.data_editor(
+                empty_shots,
+                num_rows="dynamic",
+                hide_index=True,
+                use_container_width=True,
+                key=f"opponent_shots_{period}",
+                column_config={
+                    "ShootZone": st.column_config.SelectboxColumn("Shoot Zone", options=SHOT_ZONES, default=SHOT_ZONES[0], required=True),
+                    "JerseyNumber": st.column_config.NumberColumn("Jersey Number", min_value=0, max_value=99, step=1, default=0),
+                },
+            )
+
+        st.form_submit_button("Apply Shots")
+
+    for grid, shooting_team in ((stevenson_grid, "Stevenson"), (opponent_grid, opponent)):
+        for shot in grid.dropna(subset=["ShootZone"]).itertuples(index=False):
+            data_to_save.append({
+                "GameDate": game_date.strftime('%Y-%m-%d'),
+                "Team": selected_team,
+                "Opponent": opponent,
+                "Period": period,
+                "JerseyNumber": None if pd.isna(shot.JerseyNumber) else int(shot.JerseyNumber),
+                "ShootingTeam": shooting_team,
+                "ShootZone": shot.ShootZone
+            })
+
+    st.caption(f"{len(data_to_save)} shots entered for period {period}")
+
     st.markdown("<hr>", unsafe_allow_html=True)                
                 
     # Add a "SAVE" button to save the data
@@ -455,47 +449,22 @@ with st.expander("Game Shots Input", expanded=False):
         if not data_to_save:
             st.warning("No data to save. Please add data before saving.")
         else:
-                # Check if data_to_save is not empty, and write it to storage (or process it)
-                if data_to_save:
-                    try:
-                        # Call the function to append data and upload back to S3
-                        append_to_excel_s3(S3_BUCKET, EXCEL_FILE_KEY, data_to_save, "Shots")
+            try:
+                # Journal the rows on this machine; they are uploaded as an event batch in the background
+                game_journal.save({"Shots": data_to_save}, selected_team)
 
+                # Display success message
+                st.success("Shots data saved! It is uploaded in the background.")
 
-                        # Assuming df is currently a list
-                        if isinstance(data_to_save, list):
-                            # Case 1: List of lists
-                            if all(isinstance(i, list) for i in data_to_save):
-                                # Convert list of lists into DataFrame
-                                data_to_save = pd.DataFrame(data_to_save, columns=['GameDate', 'Team', 'Opponent','Period','JerseyNumber','ShootingTeam','ShootZone'])  # Adjust column names as needed
+            except Exception as e:
+                # Display error message if something goes wrong
+                st.error(f"An error occurred while saving the shots data: {e}")
 
-                            # Case 2: List of dictionaries
-                            elif all(isinstance(i, dict) for i in data_to_save):
-                                # Convert list of dictionaries into DataFrame
-                                data_to_save = pd.DataFrame(data_to_save)
+    st.session_state["Shots_rows"] = data_to_save
 
 
-                        #write backup file:
-                        current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                        file_name = f"temp/shots_{selected_team}_{current_time}.csv"
-
-                        # Convert DataFrame to CSV in memory
-                        csv_buffer = BytesIO()
-                        data_to_save.to_csv(csv_buffer, index=False)
-
-                        csv_buffer.seek(0)
-
-                        # Upload the CSV file to S3
-                        s3.put_object(Bucket=S3_BUCKET, Key=file_name, Body=csv_buffer.getvalue())
-
-
-
-                        # Display success message
-                        st.success("Shots data successfully uploaded!")
-
-                    except Exception as e:
-                        # Display error message if something goes wrong
-                        st.error(f"An error occurred while uploading the shots data: {e}")                
+with st.expander("Game Shots Input", expanded=False):
+    shots_section()
 
 
 
@@ -509,7 +478,10 @@ st.markdown("<hr>", unsafe_allow_html=True)
 # Expander for "Hockey Game Faceoff Input"
 st.title("Hockey Game Faceoff Input")
 
-with st.expander("Game Faceoff Input", expanded=False):
+@st.fragment
+def faceoff_section():
+    faceoff_to_s3 = []
+
     #st.title("Hockey Game Faceoff Input")
     
     # Add a radio button for selecting the period, displayed horizontally
@@ -524,6 +496,7 @@ with st.expander("Game Faceoff Input", expanded=False):
             
             with cols[0]:
                 jersey_number = st.selectbox(f"Jersey Number (faceoff {i+1})", unique_jersey_numbers, key=f"faceoff_jersey_{i}")
+                jersey_number = int(jersey_number) if pd.notna(jersey_number) else None
             
             with cols[1]:
                 user_input = st.text_input("Enter win count", key=f"numeric_input_{i}")
@@ -571,48 +544,22 @@ with st.expander("Game Faceoff Input", expanded=False):
         if not faceoff_to_s3:
             st.warning("No data to save. Please add data before saving.")
         else:
+            try:
+                # Journal the rows on this machine; they are uploaded as an event batch in the background
+                game_journal.save({"Faceoff": faceoff_to_s3}, selected_team)
 
-                # Check if faceoff_to_s3 is not empty, and write it to storage (or process it)
-                if faceoff_to_s3:
-                    try:
-                        # Call the function to append data and upload back to S3
-                        append_to_excel_s3(S3_BUCKET, EXCEL_FILE_KEY, faceoff_to_s3, "Faceoff")
-
-
-                        # Assuming df is currently a list
-                        if isinstance(faceoff_to_s3, list):
-                            # Case 1: List of lists
-                            if all(isinstance(i, list) for i in faceoff_to_s3):
-                                # Convert list of lists into DataFrame
-                                faceoff_to_s3 = pd.DataFrame(faceoff_to_s3, columns=['GameDate', 'Team', 'Opponent','Period','JerseyNumber','Win','Lose'])  # Adjust column names as needed
-
-                            # Case 2: List of dictionaries
-                            elif all(isinstance(i, dict) for i in faceoff_to_s3):
-                                # Convert list of dictionaries into DataFrame
-                                faceoff_to_s3 = pd.DataFrame(faceoff_to_s3)
+                # Display success message
+                st.success("Faceoff data saved! It is uploaded in the background.")
 
+            except Exception as e:
+                # Display error message if something goes wrong
+                st.error(f"An error occurred while saving the faceoff data: {e}")
 
-                        #write backup file:
-                        current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                        file_name = f"temp/faceoff_{selected_team}_{current_time}.csv"
+    st.session_state["Faceoff_rows"] = faceoff_to_s3
 
-                        # Convert DataFrame to CSV in memory
-                        csv_buffer = BytesIO()
-                        faceoff_to_s3.to_csv(csv_buffer, index=False)
 
-                        csv_buffer.seek(0)
-
-                        # Upload the CSV file to S3
-                        s3.put_object(Bucket=S3_BUCKET, Key=file_name, Body=csv_buffer.getvalue())
-
-
-
-                        # Display success message
-                        st.success("Faceoff data successfully uploaded!")
-
-                    except Exception as e:
-                        # Display error message if something goes wrong
-                        st.error(f"An error occurred while uploading the faceoff data: {e}")                
+with st.expander("Game Faceoff Input", expanded=False):
+    faceoff_section()
  
 
     
@@ -623,7 +570,10 @@ st.markdown("<hr>", unsafe_allow_html=True)
 # Expander for "Hockey Game Faceoff Input"
 st.title("Hockey Game Goalie Data Input")
 
-with st.expander("Goalie Data Input", expanded=False):
+@st.fragment
+def goalie_section():
+    goalie_to_s3 = []
+
     #st.title("Hockey Game Faceoff Input")
     
     #goalie_jersey_numbers = unique_jersey_numbers
@@ -638,6 +588,7 @@ with st.expander("Goalie Data Input", expanded=False):
             
     with cols[0]:
         jersey_number = st.selectbox(f"Goalie Jersey Number", goalie_jersey_numbers, key=f"goalie_jersey")
+        jersey_number = int(jersey_number) if pd.notna(jersey_number) else None
             
     with cols[1]:
         user_input = st.text_input(f"{opponent} scores", key=f"opponentc_scores")
@@ -682,46 +633,52 @@ with st.expander("Goalie Data Input", expanded=False):
         if not goalie_to_s3:
             st.warning("No data to save. Please add data before saving.")
         else:
+            try:
+                # Journal the rows on this machine; they are uploaded as an event batch in the background
+                game_journal.save({"Goalie": goalie_to_s3}, selected_team)
 
-                # Check if faceoff_to_s3 is not empty, and write it to storage (or process it)
-                if goalie_to_s3:
-                    try:
-                        # Call the function to append data and upload back to S3
-                        append_to_excel_s3(S3_BUCKET, EXCEL_FILE_KEY, goalie_to_s3, "Goalie")
+                # Display success message
+                st.success("Goalie data saved! It is uploaded in the background.")
 
+            except Exception as e:
+                # Display error message if something goes wrong
+                st.error(f"An error occurred while saving the goalie data: {e}")
 
-                        # Assuming df is currently a list
-                        if isinstance(goalie_to_s3, list):
-                            # Case 1: List of lists
-                            if all(isinstance(i, list) for i in goalie_to_s3):
-                                # Convert list of lists into DataFrame
-                                goalie_to_s3 = pd.DataFrame(goalie_to_s3, columns=['GameDate', 'Team', 'Opponent','JerseyNumber','Opponent_Score','Opponent_Shots'])  # Adjust column names as needed
+    st.session_state["Goalie_rows"] = goalie_to_s3
 
-                            # Case 2: List of dictionaries
-                            elif all(isinstance(i, dict) for i in goalie_to_s3):
-                                # Convert list of dictionaries into DataFrame
-                                goalie_to_s3 = pd.DataFrame(goalie_to_s3)
 
+with st.expander("Goalie Data Input", expanded=False):
+    goalie_section()
 
-                        #write backup file:
-                        current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                        file_name = f"temp/goalie_{selected_team}_{current_time}.csv"
 
-                        # Convert DataFrame to CSV in memory
-                        csv_buffer = BytesIO()
-                        goalie_to_s3.to_csv(csv_buffer, index=False)
 
-                        csv_buffer.seek(0)
+st.markdown("<hr>", unsafe_allow_html=True)
 
-                        # Upload the CSV file to S3
-                        s3.put_object(Bucket=S3_BUCKET, Key=file_name, Body=csv_buffer.getvalue())
 
 
+# Save every input section at once: one event batch per sheet, uploaded together
+st.title("Save All Game Data")
 
-                        # Display success message
-                        st.success("Goalie data successfully uploaded!")
+if st.button("Save All"):
+    rows_by_sheet = {
+        "Scoring": st.session_state["Scoring_rows"],
+        "Shots": st.session_state["Shots_rows"],
+        "Faceoff": st.session_state["Faceoff_rows"],
+    }
 
-                    except Exception as e:
-                        # Display error message if something goes wrong
-                        st.error(f"An error occurred while uploading the goalie data: {e}")                
- 
+    # The goalie row is always filled in with defaults, so only save it once shots were entered
+    goalie_to_s3 = st.session_state["Goalie_rows"]
+    if goalie_to_s3 and goalie_to_s3[0]["Opponent_Shots"] is not None:
+        rows_by_sheet["Goalie"] = goalie_to_s3
+
+    rows_by_sheet = {sheet_name: rows for sheet_name, rows in rows_by_sheet.items() if rows}
+
+    if not rows_by_sheet:
+        st.warning("No data to save. Please add data before saving.")
+    else:
+        try:
+            game_journal.save(rows_by_sheet, selected_team)
+            st.success(f"{', '.join(rows_by_sheet)} data saved! It is uploaded in the background.")
+        except Exception as e:
+            # Display error message if something goes wrong
+            st.error(f"An error occurred while saving the game data: {e}")
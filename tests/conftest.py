@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# The apps import the shared modules as top-level modules
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+
+from local_s3 import LocalS3
+from table_store import write_manifest
+
+
+# A LocalS3 bucket holding an empty table manifest. Each test gets its own
+# bucket name, s3.bucket, as the read caches are per bucket.
+@pytest.fixture
+def s3(tmp_path):
+    s3 = LocalS3(str(tmp_path))
+    s3.bucket = f"bucket-{tmp_path.name}"
+    assert write_manifest(s3, s3.bucket, {'tables': {}}, None)
+    return s3
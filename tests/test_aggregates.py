@@ -0,0 +1,86 @@
+import json
+
+import pandas as pd
+
+from aggregates import AGGREGATES_KEY, read_aggregates, rebuild_store, update_aggregates
+from hockey_data import SHEET_NAMES, HockeyData
+from schema import apply_schema
+
+GAME = {"GameDate": "2026-01-01", "Team": "Varsity Gold", "Opponent": "Loyola", "Period": "1"}
+SHOTS = [{**GAME, "JerseyNumber": 12, "ShootingTeam": "Stevenson", "ShootZone": "A"}]
+
+OLD_KEY = "events/pending/Shots/2020-01-01_00-00-00-000000_Varsity Gold_0000000000000000.csv"
+NEW_KEY = "events/pending/Shots/2026-01-01_00-00-00-000000_Varsity Gold_1111111111111111.csv"
+
+
+def put_store(s3, applied_batches):
+    body = {'applied_batches': applied_batches, 'games': [], 'players': []}
+    s3.put_object(Bucket=s3.bucket, Key=AGGREGATES_KEY, Body=json.dumps(body).encode())
+
+
+# Keys applied long ago are dropped when the store is next updated
+def test_applied_batches_are_pruned(s3):
+    put_store(s3, {OLD_KEY: "2020-01-02T00:00:00+00:00"})
+
+    assert update_aggregates(s3, s3.bucket, {NEW_KEY: SHOTS})
+
+    store, _ = read_aggregates(s3, s3.bucket)
+    assert list(store['applied_batches']) == [NEW_KEY]
+
+
+# Stores written before apply times were kept still skip their batches
+def test_legacy_applied_batches_are_kept(s3):
+    put_store(s3, [OLD_KEY])
+
+    assert update_aggregates(s3, s3.bucket, {OLD_KEY: SHOTS, NEW_KEY: SHOTS})
+
+    store, _ = read_aggregates(s3, s3.bucket)
+    assert sorted(store['applied_batches']) == [OLD_KEY, NEW_KEY]
+    # Only the new batch's shot is counted
+    assert [totals['Shots'] for totals in store['players'].values()] == [1]
+
+
+# Applying the batches one at a time as they are saved gives the same store
+# as rebuilding it from all of their rows
+def test_incremental_store_matches_rebuild(s3):
+    later = {**GAME, "GameDate": "2026-01-08", "Period": "Overtime"}
+    batches = {
+        "events/pending/Game/2026-01-01_00-00-00-000000_Varsity Gold_2222222222222222.json": {
+            "Scoring": [
+                {**GAME, "Home": "Yes", "Win": "Yes", "ScoreStevenson": 1, "ScoreOpponent": 0, "ScoringTeam": "Stevenson", "Goal": 12, "Assistant_1": 7, "Assistant_2": None},
+                {**GAME, "Home": "Yes", "Win": "Yes", "ScoreStevenson": 2, "ScoreOpponent": 0, "ScoringTeam": "Stevenson", "Goal": 7, "Assistant_1": 12, "Assistant_2": 9},
+            ],
+            "Shots": SHOTS + [{**GAME, "JerseyNumber": 7, "ShootingTeam": "Stevenson", "ShootZone": "B"}],
+            "Faceoff": [{**GAME, "JerseyNumber": 9, "Win": 3, "Lose": 1}],
+        },
+        "events/pending/Penalties/2026-01-01_00-00-01-000000_Varsity Gold_3333333333333333.csv": [
+            {**GAME, "PenaltyTeam": "Stevenson", "JerseyNumber": 12, "PenaltyMins": 2, "PenaltyCode": "HC-MIN"},
+            {**GAME, "PenaltyTeam": "Loyola", "JerseyNumber": 4, "PenaltyMins": 5, "PenaltyCode": "RGH-MAJ"},
+        ],
+        "events/pending/Scoring/2026-01-08_00-00-00-000000_Varsity Gold_4444444444444444.csv": [
+            {**later, "Home": "No", "Win": "Tie", "ScoreStevenson": 1, "ScoreOpponent": 1, "ScoringTeam": "Stevenson", "Goal": 12, "Assistant_1": None, "Assistant_2": None},
+        ],
+        "events/pending/Shots/2026-01-08_00-00-01-000000_Varsity Gold_5555555555555555.csv": [
+            {**later, "JerseyNumber": 12, "ShootingTeam": "Stevenson", "ShootZone": "A"},
+            {**later, "JerseyNumber": 0, "ShootingTeam": "Loyola", "ShootZone": "A"},
+        ],
+    }
+
+    put_store(s3, {})
+    for batch_key, rows in batches.items():
+        assert update_aggregates(s3, s3.bucket, {batch_key: rows})
+    store, _ = read_aggregates(s3, s3.bucket)
+
+    rows_by_sheet = {}
+    for batch_key, rows in batches.items():
+        for sheet_name, sheet_rows in (rows.items() if isinstance(rows, dict) else [(batch_key.split('/')[-2], rows)]):
+            rows_by_sheet.setdefault(sheet_name, []).extend(sheet_rows)
+    data = HockeyData(
+        *(apply_schema(sheet_name, pd.DataFrame(rows_by_sheet.get(sheet_name, []))) for sheet_name in SHEET_NAMES),
+        compacted_batches=frozenset(batches),
+    )
+    rebuilt = rebuild_store(data)
+
+    assert store['games'] == rebuilt['games']
+    assert store['players'] == rebuilt['players']
+    assert store['applied_batches'].keys() == rebuilt['applied_batches'].keys()
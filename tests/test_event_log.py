@@ -0,0 +1,185 @@
+import os
+
+import pytest
+from botocore.exceptions import ClientError
+
+import event_log
+from event_log import (
+    GAME_BATCH,
+    KEYS_PREFIX,
+    compact_event_log,
+    expire_batch_index,
+    list_pending_batches,
+    load_hockey_data_with_pending,
+    new_batch_key,
+    put_event_batch,
+)
+from local_s3 import LocalS3
+from table_store import TABLE_MANIFEST_KEY, read_manifest, read_table, write_manifest
+
+TEAM = "Varsity Gold"
+GAME = {"GameDate": "2026-01-01", "Team": TEAM, "Opponent": "Loyola", "Period": "1"}
+
+SAVE_ALL = {
+    "Scoring": [{**GAME, "Home": "Yes", "Win": "Yes", "ScoreStevenson": 1, "ScoreOpponent": 0, "ScoringTeam": "Stevenson", "Goal": 12}],
+    "Shots": [{**GAME, "JerseyNumber": 12, "ShootingTeam": "Stevenson", "ShootZone": "A"}, {**GAME, "JerseyNumber": 7, "ShootingTeam": "Stevenson", "ShootZone": "B"}],
+    "Faceoff": [{**GAME, "JerseyNumber": 9, "Win": 3, "Lose": 1}],
+}
+
+
+def save(s3, sheet_name, rows):
+    return put_event_batch(s3, s3.bucket, new_batch_key(sheet_name, rows, TEAM), rows)
+
+
+def table_rows(s3, table_name):
+    manifest, _ = read_manifest(s3, s3.bucket)
+    return len(read_table(s3, s3.bucket, manifest['tables'][table_name]['key']))
+
+
+def test_save_all_is_one_batch(s3):
+    batch_key, rows = save(s3, GAME_BATCH, SAVE_ALL)
+    assert rows == SAVE_ALL
+    assert list_pending_batches(s3, s3.bucket) == [batch_key]
+
+    data = load_hockey_data_with_pending(s3, s3.bucket, 'Stevenson_Hockey.xlsx')
+    assert (len(data.scoring), len(data.shots), len(data.faceoff)) == (1, 2, 1)
+    assert batch_key in data.compacted_batches
+
+
+def test_save_all_is_compacted_with_one_manifest_write(s3):
+    batch_key, _ = save(s3, GAME_BATCH, SAVE_ALL)
+
+    manifest_writes = []
+    put_object = s3.put_object
+
+    def counting_put_object(**kwargs):
+        if kwargs['Key'] == TABLE_MANIFEST_KEY:
+            manifest_writes.append(kwargs)
+        return put_object(**kwargs)
+
+    s3.put_object = counting_put_object
+    assert compact_event_log(s3, s3.bucket) == 1
+    assert len(manifest_writes) == 1
+
+    manifest, _ = read_manifest(s3, s3.bucket)
+    assert sorted(manifest['tables']) == ["Faceoff", "Scoring", "Shots"]
+    assert all(batch_key in entry['compacted_batches'] for entry in manifest['tables'].values())
+    assert (table_rows(s3, "Scoring"), table_rows(s3, "Shots"), table_rows(s3, "Faceoff")) == (1, 2, 1)
+
+
+# Save Shots and then Save All, or the other way round: the shots are kept once
+@pytest.mark.parametrize("shots_first", [True, False])
+def test_save_all_and_single_save_share_rows(s3, shots_first):
+    if shots_first:
+        shots_key, _ = save(s3, "Shots", SAVE_ALL["Shots"])
+        game_key, rows = save(s3, GAME_BATCH, SAVE_ALL)
+        assert sorted(rows) == ["Faceoff", "Scoring"]
+    else:
+        game_key, _ = save(s3, GAME_BATCH, SAVE_ALL)
+        shots_key, rows = save(s3, "Shots", SAVE_ALL["Shots"])
+        assert shots_key == game_key
+
+    data = load_hockey_data_with_pending(s3, s3.bucket, 'Stevenson_Hockey.xlsx')
+    assert (len(data.scoring), len(data.shots), len(data.faceoff)) == (1, 2, 1)
+
+    compact_event_log(s3, s3.bucket)
+    assert (table_rows(s3, "Scoring"), table_rows(s3, "Shots"), table_rows(s3, "Faceoff")) == (1, 2, 1)
+
+
+# Keys folded long ago are dropped; recent ones, and old manifests' plain
+# lists of keys, are kept
+def test_compacted_batches_are_pruned(s3):
+    old_key = "events/pending/Shots/2020-01-01_00-00-00-000000_Varsity Gold_0000000000000000.csv"
+    legacy_key = "events/pending/Faceoff/2020-01-01_00-00-00-000000_Varsity Gold_1111111111111111.csv"
+    manifest, etag = read_manifest(s3, s3.bucket)
+    manifest['tables'] = {
+        "Shots": {'compacted_batches': {old_key: "2020-01-02T00:00:00+00:00"}},
+        "Faceoff": {'compacted_batches': [legacy_key]},
+    }
+    assert write_manifest(s3, s3.bucket, manifest, etag)
+
+    shots_key, _ = save(s3, "Shots", SAVE_ALL["Shots"])
+    faceoff_key, _ = save(s3, "Faceoff", SAVE_ALL["Faceoff"])
+    compact_event_log(s3, s3.bucket)
+
+    manifest, _ = read_manifest(s3, s3.bucket)
+    assert list(manifest['tables']['Shots']['compacted_batches']) == [shots_key]
+    assert sorted(manifest['tables']['Faceoff']['compacted_batches']) == sorted([legacy_key, faceoff_key])
+
+
+# Reruns within PENDING_LIST_TTL share one listing, but a batch this
+# process writes is seen at once
+def test_pending_listing_is_shared(s3, monkeypatch):
+    listings = []
+    list_pending_batches = event_log.list_pending_batches
+    monkeypatch.setattr(event_log, 'list_pending_batches', lambda s3, bucket: listings.append(bucket) or list_pending_batches(s3, bucket))
+
+    load_hockey_data_with_pending(s3, s3.bucket, None)
+    load_hockey_data_with_pending(s3, s3.bucket, None)
+    assert len(listings) == 1
+
+    save(s3, "Shots", SAVE_ALL["Shots"])
+    data = load_hockey_data_with_pending(s3, s3.bucket, None)
+    assert len(listings) == 2
+    assert len(data.shots) == 2
+
+
+# Old index entries of archived batches are deleted; those of pending
+# batches are kept, and an archived batch sent again is still not re-added
+def test_old_index_entries_expire(s3, tmp_path):
+    archived_key, rows = save(s3, "Shots", SAVE_ALL["Shots"])
+    compact_event_log(s3, s3.bucket)
+    save(s3, "Faceoff", SAVE_ALL["Faceoff"])
+
+    keys_dir = tmp_path / s3.bucket / KEYS_PREFIX
+    for path in keys_dir.rglob("*"):
+        if path.is_file():
+            os.utime(path, (0, 0))
+
+    assert expire_batch_index(s3, s3.bucket) == 1
+    assert [path.parent.name for path in keys_dir.rglob("*") if path.is_file()] == ["Faceoff"]
+    assert expire_batch_index(s3, s3.bucket) == 0
+
+    put_event_batch(s3, s3.bucket, archived_key, rows)
+    assert [batch_key.split('/')[-2] for batch_key in list_pending_batches(s3, s3.bucket)] == ["Faceoff"]
+
+
+# Overtime and shootout periods and tied games are not numbers or flags, and
+# are still there once the batch is folded into the table
+def test_overtime_and_tie_survive_compaction(s3):
+    rows = [{**SAVE_ALL["Scoring"][0], "Period": "Overtime", "Win": "Tie", "ScoreOpponent": 1}]
+    save(s3, "Scoring", rows)
+    compact_event_log(s3, s3.bucket)
+
+    manifest, _ = read_manifest(s3, s3.bucket)
+    df = read_table(s3, s3.bucket, manifest['tables']['Scoring']['key'])
+    assert df[['Period', 'Win', 'Home']].astype(object).values.tolist() == [["Overtime", "Tie", True]]
+
+
+# The index entry a save collides with is expired before the save reads it
+class ExpiringIndex(LocalS3):
+    expire = False
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        try:
+            return super().put_object(Bucket=Bucket, Key=Key, Body=Body, **kwargs)
+        except ClientError:
+            if self.expire and Key.startswith(KEYS_PREFIX):
+                self.expire = False
+                self.delete_object(Bucket=Bucket, Key=Key)
+            raise
+
+
+def test_save_claims_an_index_entry_expired_meanwhile(s3):
+    # The same bucket, through a client that expires the entry
+    expiring = ExpiringIndex(s3.root)
+    expiring.bucket = s3.bucket
+    s3 = expiring
+
+    batch_key, rows = save(s3, "Shots", SAVE_ALL["Shots"])
+    compact_event_log(s3, s3.bucket)
+
+    s3.expire = True
+    assert put_event_batch(s3, s3.bucket, batch_key, rows) == (batch_key, rows)
+    assert not s3.expire
+    assert list_pending_batches(s3, s3.bucket) == []
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from fact_tables import build_fact_tables
+from hockey_data import HockeyData
+from schema import apply_schema
+
+GAME = {"GameDate": "2026-01-01", "Team": "Varsity Gold", "Opponent": "Loyola", "Period": "1"}
+LATER_GAME = {**GAME, "GameDate": "2026-01-08"}
+
+
+def sheet(sheet_name, rows):
+    return apply_schema(sheet_name, pd.DataFrame(rows))
+
+
+# Every fact table carries the GameID of its game, the Goalie table
+# included, even for a game only a goalie was recorded in
+def test_every_fact_table_has_game_ids():
+    data = HockeyData(
+        roster=sheet("Roster", [{"Team": "Varsity Gold", "JerseyNumber": 30, "FirstName": "Di", "LastName": "D", "Position": "Goalie"}]),
+        scoring=sheet("Scoring", [{**GAME, "Home": "Yes", "Win": "Tie", "ScoreStevenson": 1, "ScoreOpponent": 1, "ScoringTeam": "Stevenson", "Goal": 30}]),
+        penalties=sheet("Penalties", [{**GAME, "PenaltyTeam": "Loyola", "JerseyNumber": 4, "PenaltyMins": 2, "PenaltyCode": "HC-MIN"}]),
+        shots=sheet("Shots", [{**GAME, "JerseyNumber": 30, "ShootingTeam": "Stevenson", "ShootZone": "Slot"}]),
+        faceoff=sheet("Faceoff", [{**GAME, "JerseyNumber": 30, "Win": 2, "Lose": 1}]),
+        goalie=sheet("Goalie", [{**GAME, "JerseyNumber": 30}, {**LATER_GAME, "JerseyNumber": 30}]),
+    )
+    facts = build_fact_tables(data)
+
+    assert facts.games['GameID'].tolist() == [1, 2]
+    for table in (facts.scoring, facts.penalties, facts.shots, facts.faceoff):
+        assert table['GameID'].tolist() == [1]
+    assert facts.goalie['GameID'].tolist() == [1, 2]
@@ -0,0 +1,133 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import journal as journal_module
+from journal import Journal
+
+GAME = {"GameDate": "2026-01-01", "Team": "Varsity Gold", "Opponent": "Loyola", "Period": "1"}
+
+
+# A send that fails, as with no connection, until online is set
+class FlakySend:
+    def __init__(self):
+        self.online = False
+        self.sent = []
+
+    def __call__(self, batch_key, rows):
+        if not self.online:
+            raise OSError("offline")
+        self.sent.append((batch_key, rows))
+
+
+def test_save_numpy_rows(tmp_path):
+    path = str(tmp_path / "game.jsonl")
+    send = FlakySend()
+    journal = Journal(path, send)
+
+    # Jerseys picked from the roster DataFrame are numpy ints, blanks are NA
+    rows = [{**GAME, "ScoringTeam": "Stevenson", "Goal": np.int64(12), "Assistant_1": np.int64(7), "Assistant_2": pd.NA}]
+    batch_key = journal.save({"Scoring": rows}, "Varsity Gold")
+    assert journal.backlog() == (1, 0)
+
+    # The rows survive a restart as plain values
+    replayed = Journal(path, FlakySend())
+    assert replayed.backlog() == (1, 0)
+    assert replayed._batches[batch_key][0]["Goal"] == 12
+    assert replayed._batches[batch_key][0]["Assistant_2"] is None
+
+    send.online = True
+    assert journal.drain() == 1
+    assert journal.backlog() == (0, 0)
+    assert [batch_key for batch_key, _ in send.sent] == [batch_key]
+
+
+def test_save_is_journaled_whole_or_not_at_all(tmp_path):
+    path = str(tmp_path / "game.jsonl")
+    journal = Journal(path, FlakySend())
+
+    rows_by_sheet = {
+        "Shots": [{**GAME, "JerseyNumber": 9, "ShootingTeam": "Stevenson", "ShootZone": "A"}],
+        "Faceoff": [{**GAME, "JerseyNumber": 9, "Win": object(), "Lose": 0}],
+    }
+    try:
+        journal.save(rows_by_sheet, "Varsity Gold")
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("a row that cannot be stored should fail the save")
+
+    assert journal.backlog() == (0, 0)
+    assert not os.path.exists(path)
+
+
+def wait_until_idle(journal):
+    thread = journal._thread
+    if thread is not None:
+        thread.join(timeout=10)
+    assert journal._thread is None
+
+
+def test_uploaded_journal_is_deleted(tmp_path):
+    path = str(tmp_path / "game.jsonl")
+    send = FlakySend()
+    send.online = True
+    journal = Journal(path, send)
+    assert journal._thread is None
+
+    journal.save({"Shots": [{**GAME, "JerseyNumber": 9, "ShootingTeam": "Stevenson", "ShootZone": "A"}]}, "Varsity Gold")
+    wait_until_idle(journal)
+
+    assert len(send.sent) == 1
+    assert journal.backlog() == (0, 0)
+    assert not os.path.exists(path)
+
+
+def test_uploaded_live_journal_keeps_only_its_taps(tmp_path):
+    path = str(tmp_path / "game.jsonl")
+    send = FlakySend()
+    send.online = True
+    journal = Journal(path, send)
+
+    journal.save({"Faceoff": [{**GAME, "JerseyNumber": 9, "Win": 3, "Lose": 1}]}, "Varsity Gold")
+    for _ in range(journal_module.FLUSH_EVENTS):
+        journal.append("Shots", {**GAME, "JerseyNumber": 9, "ShootingTeam": "Stevenson", "ShootZone": "A"})
+    wait_until_idle(journal)
+    assert journal.backlog() == (0, 0)
+
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert 'journal' in records[0]
+    assert [record.get('event') for record in records[1:-1]] == list(range(1, journal_module.FLUSH_EVENTS + 1))
+    assert records[-1] == {'ack': list(range(1, journal_module.FLUSH_EVENTS + 1))}
+
+    # Reopening keeps the taps for the running score and sends nothing
+    replayed = Journal(path, FlakySend())
+    assert len(replayed.events) == journal_module.FLUSH_EVENTS
+    assert replayed.backlog() == (0, 0)
+    assert replayed._thread is None
+
+
+# A journal file started again, after the last one was sent and deleted or
+# lost with the disk, numbers its taps from 1 again; an identical tap is
+# still a new event, not the earlier one sent again
+def test_taps_of_a_new_journal_file_are_new_events(tmp_path):
+    path = str(tmp_path / "game.jsonl")
+    send = FlakySend()
+    tap = {**GAME, "JerseyNumber": 9, "ShootingTeam": "Stevenson", "ShootZone": "A"}
+
+    journal = Journal(path, send)
+    journal.append("Shots", tap)
+    send.online = True
+    assert journal.drain() == 1
+    journal._wakeup.set()
+    wait_until_idle(journal)
+    os.remove(path)
+
+    journal = Journal(path, send)
+    journal.append("Shots", tap)
+    assert journal.drain() == 1
+    # put_event_batch dedups on the digest at the end of the key
+    assert len({batch_key.rsplit('_', 1)[-1] for batch_key, _ in send.sent}) == 2
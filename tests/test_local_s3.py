@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+from botocore.exceptions import OperationNotPageableError
+
+from event_log import PENDING_PREFIX, compact_event_log, list_pending_batches, new_batch_key, put_event_batch
+from hockey_data import MAX_WRITE_ATTEMPTS, WriteConflictError, backoff
+from table_store import read_manifest, read_table, write_manifest
+
+SAVERS = 4
+SAVES = 8
+COMPACTORS = 2
+
+
+def shot(saver, save):
+    return {
+        "GameDate": "2026-01-01", "Team": "Varsity Gold", "Opponent": f"Saver {saver}", "Period": "1",
+        "JerseyNumber": save, "ShootingTeam": "Stevenson", "ShootZone": "A",
+    }
+
+
+def test_listing_pages(s3):
+    for i in range(5):
+        s3.put_object(Bucket=s3.bucket, Key=f"{PENDING_PREFIX}/Shots/{i}.csv", Body=b"x")
+
+    pages = list(s3.get_paginator('list_objects_v2').paginate(Bucket=s3.bucket, Prefix=f"{PENDING_PREFIX}/", MaxKeys=2))
+    assert [page['KeyCount'] for page in pages] == [2, 2, 1]
+    assert [obj['Key'] for page in pages for obj in page['Contents']] == [f"{PENDING_PREFIX}/Shots/{i}.csv" for i in range(5)]
+
+    with pytest.raises(OperationNotPageableError):
+        s3.get_paginator('list_objects')
+
+
+# Read-modify-write of the manifest from many threads: every conditional
+# write that succeeds was based on the latest manifest, so nothing is lost
+def test_manifest_compare_and_swap(s3):
+    def add(name):
+        for attempt in range(50):
+            manifest, etag = read_manifest(s3, s3.bucket)
+            manifest['tables'][name] = {'key': name}
+            if write_manifest(s3, s3.bucket, manifest, etag):
+                return
+        raise WriteConflictError(name)
+
+    threads = [threading.Thread(target=add, args=(f"table{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    manifest, etag = read_manifest(s3, s3.bucket)
+    assert sorted(manifest['tables']) == sorted(f"table{i}" for i in range(8))
+    assert not write_manifest(s3, s3.bucket, {'tables': {}}, '"stale"')
+
+
+# Savers writing batches (each one twice, as a retry would) while
+# compactions run: every batch ends up in its table exactly once
+def test_concurrent_saves_and_compactions(s3):
+    saving = threading.Event()
+    saving.set()
+    errors = []
+    written = set()
+    written_lock = threading.Lock()
+
+    def saver(saver_id):
+        try:
+            for save in range(SAVES):
+                rows = [shot(saver_id, save)]
+                for _ in range(2):
+                    batch_key, _ = put_event_batch(s3, s3.bucket, new_batch_key("Shots", rows, "Varsity Gold"), rows)
+                    with written_lock:
+                        written.add(batch_key)
+        except Exception as e:
+            errors.append(e)
+
+    def compactor():
+        try:
+            while saving.is_set():
+                for attempt in range(MAX_WRITE_ATTEMPTS):
+                    try:
+                        compact_event_log(s3, s3.bucket)
+                        break
+                    except WriteConflictError:
+                        backoff(attempt)
+        except Exception as e:
+            errors.append(e)
+
+    savers = [threading.Thread(target=saver, args=(i,)) for i in range(SAVERS)]
+    compactors = [threading.Thread(target=compactor) for _ in range(COMPACTORS)]
+    for thread in savers + compactors:
+        thread.start()
+    for thread in savers:
+        thread.join()
+    saving.clear()
+    for thread in compactors:
+        thread.join()
+    assert errors == []
+
+    compact_event_log(s3, s3.bucket)
+    assert list_pending_batches(s3, s3.bucket) == []
+
+    manifest, _ = read_manifest(s3, s3.bucket)
+    entry = manifest['tables']['Shots']
+    assert set(entry['compacted_batches']) == written
+    assert len(written) == SAVERS * SAVES
+
+    shots = read_table(s3, s3.bucket, entry['key'])
+    saves = sorted(zip(shots['Opponent'].astype(str), shots['JerseyNumber'].astype(int)))
+    assert saves == sorted((f"Saver {saver}", save) for saver in range(SAVERS) for save in range(SAVES))
@@ -0,0 +1,39 @@
+import pandas as pd
+
+from roster_index import build_roster_index, player_ids, with_roster
+
+ROSTER = pd.DataFrame({
+    "Team": ["Varsity Gold", "Varsity Gold", "JV", "Varsity Gold"],
+    "JerseyNumber": [12, 7, 12, 30],
+    "FirstName": ["Ann", "Bo", "Cy", "Di"],
+    "LastName": ["A", "B", "C", "D"],
+    "Position": ["Forward", "Defense", "Goalie", "Forward"],
+})
+
+
+def ids_by_player(roster):
+    index = build_roster_index(roster)
+    return dict(zip(zip(roster["Team"], roster["JerseyNumber"]), player_ids(index, roster["Team"], roster["JerseyNumber"])))
+
+
+# Adding or removing a player, or a new team, leaves everyone else's PlayerID alone
+def test_player_ids_are_stable():
+    before = ids_by_player(ROSTER)
+    assert len(set(before.values())) == len(ROSTER)
+
+    added = pd.concat([ROSTER, pd.DataFrame({
+        "Team": ["Varsity Gold", "Freshman"], "JerseyNumber": [3, 12],
+        "FirstName": ["Ed", "Fay"], "LastName": ["E", "F"], "Position": ["Forward", "Defense"],
+    })], ignore_index=True)
+    after = ids_by_player(added)
+    assert {key: after[key] for key in before} == before
+
+    removed = ids_by_player(ROSTER.drop(index=1))
+    assert {key: before[key] for key in removed} == removed
+
+
+def test_with_roster_matches_merge():
+    events = pd.DataFrame({"Team": ["Varsity Gold", "JV", "Varsity Gold", "JV"], "JerseyNumber": [30, 12, 99, 7]})
+    merged = pd.merge(events, ROSTER, how='left', on=["Team", "JerseyNumber"])
+    looked_up = with_roster(events, build_roster_index(ROSTER))
+    pd.testing.assert_frame_equal(looked_up, merged, check_dtype=False)
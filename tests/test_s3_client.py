@@ -0,0 +1,54 @@
+import boto3
+import pytest
+from botocore.config import Config
+from botocore.exceptions import EndpointConnectionError
+
+import s3_client
+
+
+def latency(operation):
+    return s3_client.s3_client_stats()['latency'].get(operation, {'calls': 0, 'errors': 0})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.delenv(s3_client.LOCAL_S3_ENV, raising=False)
+    return s3_client._create_client('test-key', 'test-secret')
+
+
+def test_events_are_timed(client):
+    model = client.meta.service_model.operation_model('GetObject')
+    before = latency('GetObject')
+
+    context = {}
+    client.meta.events.emit('before-call.s3.GetObject', model=model, params={}, request_signer=None, context=context)
+    client.meta.events.emit('after-call.s3.GetObject', http_response=None, parsed={}, model=model, context=context)
+
+    context = {}
+    client.meta.events.emit('before-call.s3.GetObject', model=model, params={}, request_signer=None, context=context)
+    client.meta.events.emit('after-call-error.s3.GetObject', exception=ConnectionError("offline"), context=context)
+
+    after = latency('GetObject')
+    assert after['calls'] == before['calls'] + 2
+    assert after['errors'] == before['errors'] + 1
+
+
+# With no connection the real error reaches the caller and is counted
+def test_connection_error_is_counted(monkeypatch):
+    create = boto3.client
+
+    def offline_client(*args, **kwargs):
+        kwargs['config'] = kwargs['config'].merge(Config(retries={'max_attempts': 1}, connect_timeout=1))
+        return create(*args, endpoint_url='http://127.0.0.1:9', region_name='us-east-1', **kwargs)
+
+    monkeypatch.delenv(s3_client.LOCAL_S3_ENV, raising=False)
+    monkeypatch.setattr(boto3, 'client', offline_client)
+    client = s3_client._create_client('test-key', 'test-secret')
+    before = latency('HeadObject')
+
+    with pytest.raises(EndpointConnectionError):
+        client.head_object(Bucket='stevensonhockeydata', Key='tables/manifest.json')
+
+    after = latency('HeadObject')
+    assert after['calls'] == before['calls'] + 1
+    assert after['errors'] == before['errors'] + 1
@@ -0,0 +1,61 @@
+import os
+from datetime import datetime
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from local_s3 import LocalS3
+from xlsx_range import read_sheet_from_s3
+
+WORKBOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Stevenson_Hockey.xlsx')
+
+
+# Dates, floats, booleans, blank cells and rows, columns without a header
+# and a sheet with only a header, which the sample workbook does not have
+def typed_workbook():
+    workbook = Workbook()
+    games = workbook.active
+    games.title = "Games"
+    games.append(["GameDate", "Team", "Period", "Score", "Home", "Note"])
+    games.append([datetime(2026, 1, 1), "Varsity Gold", 1, 2.5, True, None])
+    games.append([datetime(2026, 1, 8, 19, 30), "JV", "Overtime", None, False, "late start"])
+    games.append([None, "JV", 3, 4, None, ""])
+    games.append([None] * 6)
+    games.append(["2026-01-15", "JV", 1, 0, "Yes", None])
+    workbook.create_sheet("Header Only").append(["GameDate", "Team"])
+    unnamed = workbook.create_sheet("Unnamed")
+    unnamed.append(["Team", None, "Score"])
+    unnamed.append(["JV", "x", 3])
+    unnamed.append(["JV", "y", None, "past the header"])
+    workbook.create_sheet("Empty")
+
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def sample_workbook():
+    with open(WORKBOOK, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("body", [sample_workbook(), typed_workbook()], ids=["sample", "typed"])
+def test_read_sheet_matches_read_excel(tmp_path, body):
+    s3 = LocalS3(str(tmp_path))
+    s3.put_object(Bucket="bucket", Key="workbook.xlsx", Body=body)
+    etag = s3.head_object(Bucket="bucket", Key="workbook.xlsx")['ETag']
+
+    with pd.ExcelFile(BytesIO(body)) as workbook:
+        for sheet_name in workbook.sheet_names:
+            df, read_etag = read_sheet_from_s3(s3, "bucket", "workbook.xlsx", sheet_name)
+            assert read_etag == etag
+            expected = workbook.parse(sheet_name)
+            if expected.empty and not len(expected.columns):
+                assert df.empty
+            else:
+                pd.testing.assert_frame_equal(df, expected)
+
+    df, _ = read_sheet_from_s3(s3, "bucket", "workbook.xlsx", "Goalie")
+    assert df is None